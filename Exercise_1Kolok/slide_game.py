@@ -21,6 +21,8 @@ from pygame.locals import (
     K_ESCAPE,
 )
 
+from common.hud import TextCache, get_font
+
 # Create the constants (go ahead and experiment with different values)
 # Baranje 4 i 8
 BOARDWIDTH = random.randint(4, 8)  # number of columns in the board
@@ -62,6 +64,7 @@ def main():
         FPSCLOCK, \
         DISPLAYSURF, \
         BASICFONT, \
+        TEXTCACHE, \
         RESET_SURF, \
         RESET_RECT, \
         NEW_SURF, \
@@ -75,7 +78,8 @@ def main():
     FPSCLOCK = pygame.time.Clock()
     DISPLAYSURF = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
     pygame.display.set_caption("Slide Puzzle")
-    BASICFONT = pygame.font.Font("freesansbold.ttf", BASICFONTSIZE)
+    BASICFONT = get_font("freesansbold.ttf", BASICFONTSIZE)
+    TEXTCACHE = TextCache(BASICFONT)  # tile numbers, buttons and messages
 
     # Store the option buttons and their rectangles in OPTIONS.
     # Baranje 7
@@ -306,7 +310,7 @@ def drawTile(tilex, tiley, number, adjx=0, adjy=0):
     pygame.draw.rect(
         DISPLAYSURF, TILECOLOR, (left + adjx, top + adjy, TILESIZE, TILESIZE)
     )
-    textSurf = BASICFONT.render(str(number), True, TEXTCOLOR)
+    textSurf = TEXTCACHE.render(str(number), TEXTCOLOR)
     textRect = textSurf.get_rect()
     textRect.center = left + int(TILESIZE / 2) + adjx, top + int(TILESIZE / 2) + adjy
     DISPLAYSURF.blit(textSurf, textRect)
@@ -314,7 +318,7 @@ def drawTile(tilex, tiley, number, adjx=0, adjy=0):
 
 def makeText(text, color, bgcolor, top, left):
     # create the Surface and Rect objects for some text.
-    textSurf = BASICFONT.render(text, True, color, bgcolor)
+    textSurf = TEXTCACHE.render(text, color, bgcolor)
     textRect = textSurf.get_rect()
     textRect.topleft = (top, left)
     return (textSurf, textRect)
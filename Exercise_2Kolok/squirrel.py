@@ -31,10 +31,13 @@
 #   logic as for the getting bigger at the current game.
 #   The game is over when the squirrel grows to the WINSIZE or LOSTSIZE.
 
+import argparse
 import random
 import sys
 import time
 import math
+from collections import OrderedDict
+import numpy as np
 import pygame
 from pygame.locals import (
     QUIT,
@@ -52,6 +55,9 @@ from pygame.locals import (
     K_ESCAPE,
 )
 
+from common.frame_profiler import FrameProfiler, NullFrameProfiler
+from common.sprite_cache import SpriteCache
+
 FPS = 30  # frames per second to update the screen
 WINWIDTH = 960  # width of the program's window, in pixels
 WINHEIGHT = 480  # height in pixels
@@ -70,69 +76,140 @@ BOUNCERATE = 20  # how fast the player bounces (large is slower)
 BOUNCEHEIGHT = 30  # how high the player bounces
 STARTSIZE = 25  # how big the player starts off
 WINSIZE = 300  # how big the player needs to be to win
+MAXPLAYERSIZE = 2 * WINSIZE  # the player stops growing here after winning
 LOSTSIZE = 1  # how small the player needs to be to lose
 INVULNTIME = 3  # how long the player is invulnerable after being hit in seconds
 FLASH_RATE = 5  # larger is faster blinking
 GAMEOVERTIME = 4  # how long the "game over" text stays on the screen in seconds
 MAXHEALTH = 3  # how much health the player starts with
 
-NUMGRASS = 80  # number of grass objects in the active area
+NUMGRASS = 80  # average number of grass objects in the active area
 NUMSQUIRRELS = 30  # number of squirrels in the active area
 SQUIRRELMINSPEED = 2  # slowest squirrel speed
 SQUIRRELMAXSPEED = 10  # fastest squirrel speed
 DIRCHANGEFREQ = 3  # % chance of direction change per frame
+SQUIRRELMAXBOUNCE = 50  # highest an enemy squirrel bounces, in pixels
+SQUIRRELMAXBOUNCERATE = 18  # slowest an enemy squirrel bounces
+CHUNKSIZE = 256  # width and height of a chunk of the meadow, in pixels
+MAXBAKEDCHUNKS = 32  # chunk images kept (the window shows at most 15)
+MAXDORMANTCHUNKS = 1024  # chunks that keep the squirrels that wandered off
+DORMANTPERCHUNK = 4  # most squirrels a chunk keeps, in chunks' worth of --squirrels
 LEFT = "left"
 RIGHT = "right"
+SQUIRREL_SPRITE_CACHE_SIZE = 512  # scaled squirrel images kept, per (width, height, facing)
+MAXCACHEDSPRITESIZE = WINSIZE  # bigger squirrel images are scaled every time instead
+# the parts of a frame timed by --profile and --trace, in the order they run
+PROFILEPHASES = (
+    "move",
+    "stream",
+    "spawn",
+    "camera",
+    "meadow",
+    "squirrels",
+    "player",
+    "events",
+    "collide",
+    "text",
+    "overlay",
+    "update",
+    "wait",
+)
 
 """
-This program has three data structures to represent the player, enemy squirrels, and grass background objects. The data structures are dictionaries with the following keys:
+This program has three data structures to represent the player, enemy squirrels, and the meadow with its grass. The player is a dictionary with the following keys:
 
-Keys used by all three data structures:
     'x' - the left edge coordinate of the object in the game world (not a pixel coordinate on the screen)
     'y' - the top edge coordinate of the object in the game world (not a pixel coordinate on the screen)
     'rect' - the pygame.Rect object representing where on the screen the object is located.
-Player data structure keys:
     'surface' - the pygame.Surface object that stores the image of the squirrel which will be drawn to the screen.
     'facing' - either set to LEFT or RIGHT, stores which direction the player is facing.
     'size' - the width and height of the player in pixels. (The width & height are always the same.)
     'bounce' - represents at what point in a bounce the player is in. 0 means standing (no bounce), up to BOUNCERATE (the completion of the bounce)
     'health' - an integer showing how many more times the player can be hit by a larger squirrel before dying.
-Enemy Squirrel data structure keys:
-    'surface' - the pygame.Surface object that stores the image of the squirrel which will be drawn to the screen.
+
+The enemy squirrels in the active area are kept in a SquirrelField, which stores one NumPy
+array per attribute instead of one dictionary per squirrel, so that moving, bouncing and
+culling thousands of them are a few whole-array operations. The arrays are:
+    'x', 'y' - as above, in the game world.
+    'width', 'height' - the size of the squirrel's image, in pixels
     'movex' - how many pixels per frame the squirrel moves horizontally. A negative integer is moving to the left, a positive to the right.
     'movey' - how many pixels per frame the squirrel moves vertically. A negative integer is moving up, a positive moving down.
-    'width' - the width of the squirrel's image, in pixels
-    'height' - the height of the squirrel's image, in pixels
-    'bounce' - represents at what point in a bounce the player is in. 0 means standing (no bounce), up to BOUNCERATE (the completion of the bounce)
+    'bounce' - represents at what point in a bounce the squirrel is in. 0 means standing (no bounce), up to 'bouncerate' (the completion of the bounce)
     'bouncerate' - how quickly the squirrel bounces. A lower number means a quicker bounce.
     'bounceheight' - how high (in pixels) the squirrel bounces
-Grass data structure keys:
-    'grassImage' - an integer that refers to the index of the pygame.Surface object in GRASSIMAGES used for this grass object
+    The image of a squirrel is looked up by its size and whether 'movex' faces left or right.
+
+The meadow is a ChunkWorld: square chunks of CHUNKSIZE pixels, keyed by (x, y) chunk
+coordinates. The grass on a chunk comes from a random generator seeded with the world's
+seed and the chunk's coordinates, so it is the same every time the chunk is made, and is
+drawn once onto an image of the whole chunk. Squirrels that leave the active area are
+kept in the chunk they were in and come back when the chunk comes near the camera again.
 """
 
 
 def main():
     global FPSCLOCK, DISPLAYSURF, BASICFONT, L_SQUIR_IMG, R_SQUIR_IMG, GRASSIMAGES
+    global SQUIRRELSPRITES, PROFILER, PROFILEFONT
 
+    args = parseArgs()
     pygame.init()
     FPSCLOCK = pygame.time.Clock()
     pygame.display.set_icon(pygame.image.load("Exercise_2Kolok/gameicon.png"))
     DISPLAYSURF = pygame.display.set_mode((WINWIDTH, WINHEIGHT))
     pygame.display.set_caption("Squirrel Eat Squirrel")
     BASICFONT = pygame.font.Font("freesansbold.ttf", 32)
+    PROFILEFONT = None
+    if args.profile:
+        PROFILEFONT = pygame.font.SysFont("monospace", 14)
+    if args.profile or args.trace:
+        PROFILER = FrameProfiler(PROFILEPHASES, trace=args.trace)
+    else:
+        PROFILER = NullFrameProfiler()
 
-    # load the image files
-    L_SQUIR_IMG = pygame.image.load("Exercise_2Kolok/squirrel.png")
+    # load the image files, converted to the display's pixel format so that
+    # blitting hundreds of them a frame stays cheap
+    L_SQUIR_IMG = pygame.image.load("Exercise_2Kolok/squirrel.png").convert_alpha()
     R_SQUIR_IMG = pygame.transform.flip(L_SQUIR_IMG, True, False)
+    SQUIRRELSPRITES = SpriteCache(makeSquirrelSurface, SQUIRREL_SPRITE_CACHE_SIZE)
     GRASSIMAGES = []
     for i in range(1, 5):
-        GRASSIMAGES.append(pygame.image.load("Exercise_2Kolok/grass%s.png" % i))
+        GRASSIMAGES.append(
+            pygame.image.load("Exercise_2Kolok/grass%s.png" % i).convert_alpha()
+        )
 
     while True:
-        runGame()
+        runGame(args.squirrels, args.grass)
 
 
-def runGame():
+def parseArgs():
+    parser = argparse.ArgumentParser(description="Squirrel Eat Squirrel")
+    parser.add_argument(
+        "--squirrels",
+        type=int,
+        default=NUMSQUIRRELS,
+        help="number of enemy squirrels in the active area",
+    )
+    parser.add_argument(
+        "--grass",
+        type=int,
+        default=NUMGRASS,
+        help="average number of grass objects in the active area",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="show how long each part of a frame takes (p50/p99 of recent frames)",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="write the time of each part of every frame to PATH, in nanoseconds "
+        "(CSV, or JSON lines if PATH ends in .jsonl)",
+    )
+    return parser.parse_args()
+
+
+def runGame(numSquirrels=NUMSQUIRRELS, numGrass=NUMGRASS):
     # set up variables for the start of a new game
     invulnerableMode = False  # if the player is invulnerable
     invulnerableStartTime = 0  # time the player became invulnerable
@@ -157,15 +234,14 @@ def runGame():
     camerax = 0
     cameray = 0
 
-    grassObjs = []  # stores all the grass objects in the game
-    squirrelObjs = [
-        makeNewSquirrel(camerax, cameray, outside_camera=False),
-        makeNewSquirrel(camerax, cameray, outside_camera=False),
-        makeNewSquirrel(camerax, cameray, outside_camera=False),
-    ]  # stores all the non-player squirrel objects
+    npRng = np.random.default_rng(random.getrandbits(64))
+    # the meadow, its grass and the squirrels that wandered off
+    world = ChunkWorld(random.getrandbits(64), numGrass, numSquirrels)
+    squirrelField = SquirrelField(npRng)  # stores the non-player squirrels nearby
+    squirrelField.spawn(3, camerax, cameray, outside_camera=False)
     # stores the player object:
     playerObj = {
-        "surface": pygame.transform.scale(L_SQUIR_IMG, (STARTSIZE, STARTSIZE)),
+        "surface": getSquirrelSurface(STARTSIZE, STARTSIZE, LEFT),
         "facing": LEFT,
         "size": STARTSIZE,
         "x": HALF_WINWIDTH,
@@ -179,52 +255,27 @@ def runGame():
     moveUp = False
     moveDown = False
 
-    # start off with some random grass images on the screen
-    for i in range(10):
-        grassObjs.append(makeNewGrass(camerax, cameray))
-        grassObjs[i]["x"] = random.randint(0, WINWIDTH)
-        grassObjs[i]["y"] = random.randint(0, WINHEIGHT)
-
+    PROFILER.discard()  # the setup above is not part of a frame
     while True:  # main game loop
         # Check if we should turn off invulnerability
         if invulnerableMode and time.time() - invulnerableStartTime > INVULNTIME:
             invulnerableMode = False
 
-        # move all the squirrels
-        for sObj in squirrelObjs:
-            # move the squirrel, and adjust for their bounce
-            sObj["x"] += sObj["movex"]
-            sObj["y"] += sObj["movey"]
-            sObj["bounce"] += 1
-            if sObj["bounce"] > sObj["bouncerate"]:
-                sObj["bounce"] = 0  # reset bounce amount
-
-            # random chance they change direction
-            if random.randint(0, 99) < DIRCHANGEFREQ:
-                sObj["movex"] = getRandomVelocity()
-                sObj["movey"] = getRandomVelocity()
-                if sObj["movex"] > 0:  # faces right
-                    sObj["surface"] = pygame.transform.scale(
-                        R_SQUIR_IMG, (sObj["width"], sObj["height"])
-                    )
-                else:  # faces left
-                    sObj["surface"] = pygame.transform.scale(
-                        L_SQUIR_IMG, (sObj["width"], sObj["height"])
-                    )
+        # move all the squirrels, adjust for their bounce and
+        # give some of them a new direction
+        squirrelField.move()
+        PROFILER.mark("move")
 
-        # go through all the objects and see if any need to be deleted.
-        for i in range(len(grassObjs) - 1, -1, -1):
-            if isOutsideActiveArea(camerax, cameray, grassObjs[i]):
-                del grassObjs[i]
-        for i in range(len(squirrelObjs) - 1, -1, -1):
-            if isOutsideActiveArea(camerax, cameray, squirrelObjs[i]):
-                del squirrelObjs[i]
+        # put away the squirrels that have left the active area and bring
+        # back the ones in the chunks that have come into it.
+        world.update(camerax, cameray, squirrelField)
+        PROFILER.mark("stream")
 
-        # add more grass & squirrels if we don't have enough.
-        while len(grassObjs) < NUMGRASS:
-            grassObjs.append(makeNewGrass(camerax, cameray))
-        while len(squirrelObjs) < NUMSQUIRRELS:
-            squirrelObjs.append(makeNewSquirrel(camerax, cameray, outside_camera=True))
+        # add more squirrels if we don't have enough.
+        squirrelField.spawn(
+            numSquirrels - len(squirrelField), camerax, cameray, outside_camera=True
+        )
+        PROFILER.mark("spawn")
 
         # adjust camerax and cameray if beyond the "camera slack"
         playerCenterx = playerObj["x"] + int(playerObj["size"] / 2)
@@ -237,37 +288,15 @@ def runGame():
             cameray = playerCentery + CAMERA_SLACK_Y - HALF_WINHEIGHT
         elif playerCentery - (cameray + HALF_WINHEIGHT) > CAMERA_SLACK_Y:
             cameray = playerCentery - CAMERA_SLACK_Y - HALF_WINHEIGHT
+        PROFILER.mark("camera")
 
-        # draw the green background
-        DISPLAYSURF.fill(GRASSCOLOR)
-
-        # draw all the grass objects on the screen
-        for gObj in grassObjs:
-            gRect = pygame.Rect(
-                (
-                    gObj["x"] - camerax,
-                    gObj["y"] - cameray,
-                    gObj["width"],
-                    gObj["height"],
-                )
-            )
-            DISPLAYSURF.blit(GRASSIMAGES[gObj["grassImage"]], gRect)
+        # draw the meadow, which covers the whole screen
+        world.draw(DISPLAYSURF, camerax, cameray)
+        PROFILER.mark("meadow")
 
         # draw the other squirrels
-        for sObj in squirrelObjs:
-            sObj["rect"] = pygame.Rect(
-                (
-                    sObj["x"] - camerax,
-                    sObj["y"]
-                    - cameray
-                    - getBounceAmount(
-                        sObj["bounce"], sObj["bouncerate"], sObj["bounceheight"]
-                    ),
-                    sObj["width"],
-                    sObj["height"],
-                )
-            )
-            DISPLAYSURF.blit(sObj["surface"], sObj["rect"])
+        squirrelField.draw(DISPLAYSURF, camerax, cameray)
+        PROFILER.mark("squirrels")
 
         # draw the player squirrel
         flashIsOn = round(time.time(), 1) * FLASH_RATE % 2 == 1
@@ -286,6 +315,7 @@ def runGame():
 
         # draw the health meter
         drawHealthMeter(playerObj["health"])
+        PROFILER.mark("player")
 
         for event in pygame.event.get():  # event handling loop
             if event.type == QUIT:
@@ -302,16 +332,16 @@ def runGame():
                     moveRight = False
                     moveLeft = True
                     if playerObj["facing"] != LEFT:  # change player image
-                        playerObj["surface"] = pygame.transform.scale(
-                            L_SQUIR_IMG, (playerObj["size"], playerObj["size"])
+                        playerObj["surface"] = getSquirrelSurface(
+                            playerObj["size"], playerObj["size"], LEFT
                         )
                     playerObj["facing"] = LEFT
                 elif event.key in (K_RIGHT, K_d):
                     moveLeft = False
                     moveRight = True
                     if playerObj["facing"] != RIGHT:  # change player image
-                        playerObj["surface"] = pygame.transform.scale(
-                            R_SQUIR_IMG, (playerObj["size"], playerObj["size"])
+                        playerObj["surface"] = getSquirrelSurface(
+                            playerObj["size"], playerObj["size"], RIGHT
                         )
                     playerObj["facing"] = RIGHT
                 elif winMode and event.key == K_r:
@@ -330,6 +360,7 @@ def runGame():
 
                 elif event.key == K_ESCAPE:
                     terminate()
+        PROFILER.mark("events")
 
         if not gameOverMode:
             # actually move the player
@@ -351,44 +382,45 @@ def runGame():
                 playerObj["bounce"] = 0  # reset bounce amount
 
             # check if the player has collided with any squirrels
-            for i in range(len(squirrelObjs) - 1, -1, -1):
-                sqObj = squirrelObjs[i]
-                if "rect" in sqObj and playerObj["rect"].colliderect(sqObj["rect"]):
-                    # a player/squirrel collision has occurred
-
-                    if sqObj["width"] * sqObj["height"] <= playerObj["size"] ** 2:
-                        # player is larger and eats the squirrel
-                        playerObj["size"] += (
-                            int((sqObj["width"] * sqObj["height"]) ** 0.2) + 1
-                        )
-                        del squirrelObjs[i]
-
-                        if playerObj["facing"] == LEFT:
-                            playerObj["surface"] = pygame.transform.scale(
-                                L_SQUIR_IMG, (playerObj["size"], playerObj["size"])
-                            )
-                        if playerObj["facing"] == RIGHT:
-                            playerObj["surface"] = pygame.transform.scale(
-                                R_SQUIR_IMG, (playerObj["size"], playerObj["size"])
-                            )
-
-                        if playerObj["size"] > WINSIZE:
-                            winMode = True  # turn on "win mode"
-
-                    elif not invulnerableMode:
-                        # player is smaller and takes damage
-                        invulnerableMode = True
-                        invulnerableStartTime = time.time()
-                        # Calculate size reduction based on enemy squirrel size
-                        size_reduction = (
-                            int((sqObj["width"] * sqObj["height"]) ** 0.2) + 1
-                        )
-                        playerObj["size"] -= size_reduction
-
-                        # Check for game over conditions
-                        if playerObj["size"] <= LOSTSIZE:
-                            gameOverMode = True
-                            gameOverStartTime = time.time()
+            # (the rects are drawn on screen, so move the player's into the world)
+            hits = squirrelField.colliding(playerObj["rect"].move(camerax, cameray))
+            eaten = []
+            oldSize = playerObj["size"]
+            for i in reversed(hits.tolist()):
+                # a player/squirrel collision has occurred
+                sqArea = int(squirrelField.width[i]) * int(squirrelField.height[i])
+
+                if sqArea <= playerObj["size"] ** 2:
+                    # player is larger and eats the squirrel
+                    playerObj["size"] = min(
+                        playerObj["size"] + int(sqArea**0.2) + 1, MAXPLAYERSIZE
+                    )
+                    eaten.append(i)
+
+                    if playerObj["size"] > WINSIZE:
+                        winMode = True  # turn on "win mode"
+
+                elif not invulnerableMode:
+                    # player is smaller and takes damage
+                    invulnerableMode = True
+                    invulnerableStartTime = time.time()
+                    # Calculate size reduction based on enemy squirrel size
+                    # (never below LOSTSIZE, so there is always an image to draw)
+                    size_reduction = int(sqArea**0.2) + 1
+                    playerObj["size"] = max(playerObj["size"] - size_reduction, LOSTSIZE)
+
+                    # Check for game over conditions
+                    if playerObj["size"] <= LOSTSIZE:
+                        gameOverMode = True
+                        gameOverStartTime = time.time()
+            if eaten:
+                squirrelField.remove(eaten)
+            if playerObj["size"] != oldSize:
+                # scale the player's image once, however many squirrels it hit
+                playerObj["surface"] = getSquirrelSurface(
+                    playerObj["size"], playerObj["size"], playerObj["facing"]
+                )
+            PROFILER.mark("collide")
         else:
             # game is over, show "game over" text
             DISPLAYSURF.blit(gameOverSurf, gameOverRect)
@@ -399,9 +431,17 @@ def runGame():
         if winMode:
             DISPLAYSURF.blit(winSurf, winRect)
             DISPLAYSURF.blit(winSurf2, winRect2)
+        PROFILER.mark("text")
+
+        if PROFILEFONT is not None:
+            PROFILER.draw(DISPLAYSURF, PROFILEFONT, (WINWIDTH - 200, 5))
+            PROFILER.mark("overlay")
 
         pygame.display.update()
+        PROFILER.mark("update")
         FPSCLOCK.tick(FPS)
+        PROFILER.mark("wait")
+        PROFILER.end_frame()
 
 
 def drawHealthMeter(currentHealth):
@@ -415,10 +455,31 @@ def drawHealthMeter(currentHealth):
 
 def terminate():
     pygame.quit()
+    PROFILER.close()
+    print(f"Squirrel sprite cache: {SQUIRRELSPRITES}")
+    if PROFILER.frames:
+        print(f"Frame profile: {PROFILER}")
     sys.exit()
 
 
-def getBounceAmount(currentBounce, bounceRate, bounceHeight):
+def makeSquirrelSurface(key):
+    # Scale the squirrel image for a (width, height, facing) key.
+    width, height, facing = key
+    image = L_SQUIR_IMG if facing == LEFT else R_SQUIR_IMG
+    return pygame.transform.scale(image, (width, height))
+
+
+def getSquirrelSurface(width, height, facing):
+    # Every squirrel of the same size and facing shares one scaled image.
+    # Only the player gets bigger than MAXCACHEDSPRITESIZE (it grows up to
+    # MAXPLAYERSIZE after winning), and caching those images would only fill
+    # up memory.
+    if max(width, height) > MAXCACHEDSPRITESIZE:
+        return makeSquirrelSurface((width, height, facing))
+    return SQUIRRELSPRITES.get((width, height, facing))
+
+
+def calculateBounceAmount(currentBounce, bounceRate, bounceHeight):
     # Returns the number of pixels to offset based on the bounce.
     # Larger bounceRate means a slower bounce.
     # Larger bounceHeight means a higher bounce.
@@ -426,69 +487,413 @@ def getBounceAmount(currentBounce, bounceRate, bounceHeight):
     return int(math.sin((math.pi / float(bounceRate)) * currentBounce) * bounceHeight)
 
 
-def getRandomVelocity():
-    speed = random.randint(SQUIRRELMINSPEED, SQUIRRELMAXSPEED)
-    if random.randint(0, 1) == 0:
-        return speed
-    else:
-        return -speed
+def makeBounceTable(maxRate, maxHeight):
+    # table[rate, bounce, height] is calculateBounceAmount(bounce, rate, height)
+    # for every rate up to maxRate, bounce up to rate and height up to
+    # maxHeight (the other entries are 0).
+    heights = np.arange(maxHeight + 1)
+    table = np.zeros((maxRate + 1, maxRate + 1, maxHeight + 1), np.int16)
+    for rate in range(1, maxRate + 1):
+        for bounce in range(rate + 1):
+            table[rate, bounce] = np.trunc(math.sin((math.pi / float(rate)) * bounce) * heights)
+    return table
+
+
+# Bounces only ever take a few hundred (rate, bounce) steps, so every offset
+# the player and the squirrels can have is worked out once, here.
+BOUNCETABLE = makeBounceTable(
+    max(BOUNCERATE, SQUIRRELMAXBOUNCERATE), max(BOUNCEHEIGHT, SQUIRRELMAXBOUNCE)
+)
+
+
+def getBounceAmount(currentBounce, bounceRate, bounceHeight):
+    # calculateBounceAmount(), looked up in BOUNCETABLE when it is in there.
+    if bounceRate < BOUNCETABLE.shape[0] and bounceHeight < BOUNCETABLE.shape[2]:
+        return int(BOUNCETABLE[bounceRate, currentBounce, bounceHeight])
+    return calculateBounceAmount(currentBounce, bounceRate, bounceHeight)
+
+
+def getBounceAmounts(currentBounces, bounceRates, bounceHeights):
+    # getBounceAmount() for arrays of bounces, all of them in BOUNCETABLE.
+    return BOUNCETABLE[bounceRates, currentBounces, bounceHeights]
+
+
+def getRandomVelocities(rng, count):
+    # count random velocities, each SQUIRRELMINSPEED to SQUIRRELMAXSPEED
+    # pixels per frame in either direction.
+    speed = rng.integers(SQUIRRELMINSPEED, SQUIRRELMAXSPEED, count, endpoint=True)
+    return np.where(rng.integers(0, 2, count) == 0, speed, -speed)
+
+
+def isInActiveArea(camerax, cameray, x, y, width, height):
+    # Whether objects (arrays of their rects) are no more than a window's
+    # length beyond the edge of the camera view.
+    return (
+        (x < camerax + 2 * WINWIDTH)
+        & (x + width > camerax - WINWIDTH)
+        & (y < cameray + 2 * WINHEIGHT)
+        & (y + height > cameray - WINHEIGHT)
+    )
 
 
 def getPositionRelativeToCameraView(
     camerax, cameray, objWidth, objHeight, outside_camera
 ):
-    # create a Rect of the camera view
-    cameraRect = pygame.Rect(camerax, cameray, WINWIDTH, WINHEIGHT)
-    while True:
-        x = random.randint(camerax - WINWIDTH, camerax + (2 * WINWIDTH))
-        y = random.randint(cameray - WINHEIGHT, cameray + (2 * WINHEIGHT))
-        # create a Rect object with the random coordinates
-        objRect = pygame.Rect(x, y, objWidth, objHeight)
-        if objRect.colliderect(cameraRect) != outside_camera:
-            return x, y
-
-
-def makeNewSquirrel(camerax, cameray, outside_camera):
-    sq = {}
-    generalSize = random.randint(5, 25)
-    multiplier = random.randint(1, 3)
-    sq["width"] = (generalSize + random.randint(0, 10)) * multiplier
-    sq["height"] = (generalSize + random.randint(0, 10)) * multiplier
-    sq["x"], sq["y"] = getPositionRelativeToCameraView(
-        camerax, cameray, sq["width"], sq["height"], outside_camera
-    )
-    sq["movex"] = getRandomVelocity()
-    sq["movey"] = getRandomVelocity()
-    if sq["movex"] < 0:  # squirrel is facing left
-        sq["surface"] = pygame.transform.scale(L_SQUIR_IMG, (sq["width"], sq["height"]))
-    else:  # squirrel is facing right
-        sq["surface"] = pygame.transform.scale(R_SQUIR_IMG, (sq["width"], sq["height"]))
-    sq["bounce"] = 0
-    sq["bouncerate"] = random.randint(10, 18)
-    sq["bounceheight"] = random.randint(10, 50)
-    return sq
-
-
-def makeNewGrass(camerax, cameray):
-    gr = {}
-    gr["grassImage"] = random.randint(0, len(GRASSIMAGES) - 1)
-    gr["width"] = GRASSIMAGES[0].get_width()
-    gr["height"] = GRASSIMAGES[0].get_height()
-    gr["x"], gr["y"] = getPositionRelativeToCameraView(
-        camerax, cameray, gr["width"], gr["height"], outside_camera=True
+    # Return a random top left corner for an object in the area a window's
+    # length around the camera view, either overlapping the camera view or
+    # not. The corners allowed are numbered and a single random number is
+    # mapped back onto them, so they come out as evenly as if corners were
+    # drawn from the whole area until one landed in the right place, but
+    # without the retries.
+    left, right = camerax - WINWIDTH, camerax + 2 * WINWIDTH  # inclusive
+    top, bottom = cameray - WINHEIGHT, cameray + 2 * WINHEIGHT
+    # the corners that make the object overlap the camera view
+    insideLeft = max(left, camerax - objWidth + 1)
+    insideRight = min(right, camerax + WINWIDTH - 1)
+    insideTop = max(top, cameray - objHeight + 1)
+    insideBottom = min(bottom, cameray + WINHEIGHT - 1)
+    insideWidth = insideRight - insideLeft + 1
+    insideHeight = insideBottom - insideTop + 1
+
+    if not outside_camera:
+        row, column = divmod(random.randrange(insideWidth * insideHeight), insideWidth)
+        return insideLeft + column, insideTop + row
+
+    # Outside, the corners are the rows above and below the inside ones,
+    # then the parts of the inside rows to their left and right.
+    width = right - left + 1
+    cell = random.randrange((bottom - top + 1) * width - insideWidth * insideHeight)
+    aboveCells = (insideTop - top) * width
+    if cell < aboveCells:
+        row, column = divmod(cell, width)
+        return left + column, top + row
+    cell -= aboveCells
+    belowCells = (bottom - insideBottom) * width
+    if cell < belowCells:
+        row, column = divmod(cell, width)
+        return left + column, insideBottom + 1 + row
+    cell -= belowCells
+    leftWidth = insideLeft - left
+    if cell < insideHeight * leftWidth:
+        row, column = divmod(cell, leftWidth)
+        return left + column, insideTop + row
+    cell -= insideHeight * leftWidth
+    row, column = divmod(cell, right - insideRight)
+    return insideRight + 1 + column, insideTop + row
+
+
+class EntityField:
+    # Structure-of-arrays store: one NumPy array per attribute named in
+    # FIELDS, with the live objects packed at the front in the order they
+    # were added. Subclasses add the attributes and the drawing.
+
+    FIELDS = ("x", "y", "width", "height")
+
+    def __init__(self, rng, capacity=64):
+        self.rng = rng  # numpy.random.Generator
+        self.count = 0
+        for name in self.FIELDS:
+            setattr(self, name, np.zeros(capacity, dtype=np.int32))
+
+    def __len__(self):
+        return self.count
+
+    def reserve(self, extra):
+        capacity = len(self.x)
+        if self.count + extra <= capacity:
+            return
+        capacity = max(capacity * 2, self.count + extra)
+        for name in self.FIELDS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[: self.count] = old[: self.count]
+            setattr(self, name, new)
+
+    def add(self, count, camerax, cameray, outside_camera):
+        # Make room for count more objects and place them around the camera
+        # view; the caller fills in width and height first and the rest after.
+        start = self.count
+        widths = self.width[start : start + count].tolist()
+        heights = self.height[start : start + count].tolist()
+        for i, width, height in zip(range(start, start + count), widths, heights):
+            self.x[i], self.y[i] = getPositionRelativeToCameraView(
+                camerax, cameray, width, height, outside_camera
+            )
+        self.count += count
+        return slice(start, start + count)
+
+    def keep(self, mask):
+        # Compact the arrays down to the objects where mask is True.
+        n = self.count
+        kept = int(np.count_nonzero(mask))
+        for name in self.FIELDS:
+            array = getattr(self, name)
+            array[:kept] = array[:n][mask]
+        self.count = kept
+
+    def remove(self, indices):
+        mask = np.ones(self.count, dtype=bool)
+        mask[indices] = False
+        self.keep(mask)
+
+    def rows(self, objects):
+        # The objects as a 2D array, one row per object and one column per
+        # entry of FIELDS.
+        return np.stack([getattr(self, name)[objects] for name in self.FIELDS], axis=1)
+
+    def addRows(self, rows):
+        # Add the objects given as rows().
+        count = len(rows)
+        self.reserve(count)
+        new = slice(self.count, self.count + count)
+        for column, name in enumerate(self.FIELDS):
+            getattr(self, name)[new] = rows[:, column]
+        self.count += count
+
+    def cull(self, camerax, cameray):
+        # Delete the objects more than a window's length beyond the edge of
+        # the camera view, and return them as rows().
+        n = self.count
+        inside = isInActiveArea(
+            camerax, cameray, self.x[:n], self.y[:n], self.width[:n], self.height[:n]
+        )
+        if inside.all():
+            return self.rows(slice(0, 0))
+        leaving = self.rows(np.flatnonzero(~inside))
+        self.keep(inside)
+        return leaving
+
+    def visible(self, objects, left, top):
+        # Which of the objects (an index array or slice), with their rects at
+        # (left, top) on screen, are in the window.
+        return (
+            (left < WINWIDTH)
+            & (left + self.width[objects] > 0)
+            & (top < WINHEIGHT)
+            & (top + self.height[objects] > 0)
+        )
+
+
+class SquirrelField(EntityField):
+    FIELDS = EntityField.FIELDS + (
+        "movex",
+        "movey",
+        "bounce",
+        "bouncerate",
+        "bounceheight",
     )
-    gr["rect"] = pygame.Rect((gr["x"], gr["y"], gr["width"], gr["height"]))
-    return gr
-
-
-def isOutsideActiveArea(camerax, cameray, obj):
-    # Return False if camerax and cameray are more than
-    # a half-window length beyond the edge of the window.
-    boundsLeftEdge = camerax - WINWIDTH
-    boundsTopEdge = cameray - WINHEIGHT
-    boundsRect = pygame.Rect(boundsLeftEdge, boundsTopEdge, WINWIDTH * 3, WINHEIGHT * 3)
-    objRect = pygame.Rect(obj["x"], obj["y"], obj["width"], obj["height"])
-    return not boundsRect.colliderect(objRect)
+
+    def __init__(self, rng, capacity=64):
+        super().__init__(rng, capacity)
+        self.drawn = np.empty(0, dtype=np.intp)  # indices, see draw()
+        self.drawnTop = np.empty(0, dtype=np.int32)  # their top edges in the world
+
+    def spawn(self, count, camerax, cameray, outside_camera):
+        if count <= 0:
+            return
+        rng = self.rng
+        self.reserve(count)
+        new = slice(self.count, self.count + count)
+        generalSize = rng.integers(5, 25, count, endpoint=True)
+        multiplier = rng.integers(1, 3, count, endpoint=True)
+        self.width[new] = (generalSize + rng.integers(0, 10, count, endpoint=True)) * multiplier
+        self.height[new] = (generalSize + rng.integers(0, 10, count, endpoint=True)) * multiplier
+        self.add(count, camerax, cameray, outside_camera)
+        self.movex[new] = getRandomVelocities(rng, count)
+        self.movey[new] = getRandomVelocities(rng, count)
+        self.bounce[new] = 0
+        self.bouncerate[new] = rng.integers(10, SQUIRRELMAXBOUNCERATE, count, endpoint=True)
+        self.bounceheight[new] = rng.integers(10, SQUIRRELMAXBOUNCE, count, endpoint=True)
+
+    def move(self):
+        n = self.count
+        self.x[:n] += self.movex[:n]
+        self.y[:n] += self.movey[:n]
+        bounce = self.bounce[:n]
+        bounce += 1
+        bounce[bounce > self.bouncerate[:n]] = 0  # reset bounce amount
+
+        # random chance they change direction
+        changing = np.flatnonzero(self.rng.integers(0, 100, n) < DIRCHANGEFREQ)
+        if len(changing):
+            self.movex[changing] = getRandomVelocities(self.rng, len(changing))
+            self.movey[changing] = getRandomVelocities(self.rng, len(changing))
+
+    def bounceAmounts(self, objects):
+        # getBounceAmount() for each of the squirrels.
+        return getBounceAmounts(
+            self.bounce[objects], self.bouncerate[objects], self.bounceheight[objects]
+        )
+
+    def draw(self, surface, camerax, cameray):
+        # Only the squirrels that would be on screen somewhere in their bounce
+        # get their bounce worked out, and only those really on screen are
+        # drawn. They are remembered (until the squirrels next change) as the
+        # only ones the player can bump into.
+        n = self.count
+        left = self.x[:n] - camerax
+        standing = self.y[:n] - cameray
+        near = np.flatnonzero(
+            (left < WINWIDTH)
+            & (left + self.width[:n] > 0)
+            & (standing - SQUIRRELMAXBOUNCE < WINHEIGHT)
+            & (standing + self.height[:n] > 0)
+        )
+        top = standing[near] - self.bounceAmounts(near)
+        onScreen = self.visible(near, left[near], top)
+        self.drawn = near[onScreen]
+        self.drawnTop = top[onScreen] + cameray
+        blits = []
+        for x, y, width, height, movex in zip(
+            left[self.drawn].tolist(),
+            (self.drawnTop - cameray).tolist(),
+            self.width[self.drawn].tolist(),
+            self.height[self.drawn].tolist(),
+            self.movex[self.drawn].tolist(),
+        ):
+            facing = RIGHT if movex > 0 else LEFT
+            blits.append((getSquirrelSurface(width, height, facing), (x, y)))
+        surface.blits(blits, doreturn=False)
+
+    def keep(self, mask):
+        super().keep(mask)
+        self.drawn = np.empty(0, dtype=np.intp)
+        self.drawnTop = np.empty(0, dtype=np.int32)
+
+    def colliding(self, rect):
+        # Indices of the squirrels that overlap rect (in world coordinates)
+        # where they were last drawn.
+        drawn, top = self.drawn, self.drawnTop
+        x = self.x[drawn]
+        return drawn[
+            (x < rect.right)
+            & (x + self.width[drawn] > rect.left)
+            & (top < rect.bottom)
+            & (top + self.height[drawn] > rect.top)
+        ]
+
+
+class ChunkWorld:
+    # The endless meadow, streamed in around the camera one chunk at a time.
+    #
+    # A chunk's grass is made from its own seed whenever it is needed, so
+    # nothing about the grass is stored but the images of the chunks drawn
+    # recently (a SpriteCache of baked chunks, least recently used dropped
+    # first). Squirrels that leave the active area are put away as rows in
+    # the chunk their top left corner is in, and added back to the field
+    # once the active area reaches them again, as long as that leaves no
+    # more than numSquirrels in the field. Each chunk keeps only its last
+    # few squirrels, and only the last MAXDORMANTCHUNKS chunks to be given
+    # squirrels keep them, so memory stays bounded however far the player
+    # goes (or however long they stay put).
+
+    def __init__(self, seed, numGrass=NUMGRASS, numSquirrels=NUMSQUIRRELS):
+        self.seed = seed
+        # grass objects per chunk, on average, to put numGrass in the active area
+        self.grassPerChunk = numGrass * CHUNKSIZE**2 / (9 * WINWIDTH * WINHEIGHT)
+        self.numSquirrels = numSquirrels
+        squirrelsPerChunk = numSquirrels * CHUNKSIZE**2 / (9 * WINWIDTH * WINHEIGHT)
+        self.maxDormantPerChunk = math.ceil(DORMANTPERCHUNK * squirrelsPerChunk)
+        self.baked = SpriteCache(self.bakeChunk, MAXBAKEDCHUNKS)
+        self.dormant = OrderedDict()  # (chunk x, chunk y) -> squirrel rows
+
+    def chunkRng(self, chunk):
+        cx, cy = chunk
+        return np.random.default_rng((self.seed, cx % 2**32, cy % 2**32))
+
+    def bakeChunk(self, chunk):
+        # Draw the grass of a chunk onto an image of the whole chunk. The
+        # grass objects are kept inside the chunk so no chunk has to draw
+        # over its neighbours.
+        rng = self.chunkRng(chunk)
+        count = rng.poisson(self.grassPerChunk)
+        grassWidth = max(image.get_width() for image in GRASSIMAGES)
+        grassHeight = max(image.get_height() for image in GRASSIMAGES)
+        images = rng.integers(0, len(GRASSIMAGES), count).tolist()
+        xs = rng.integers(0, CHUNKSIZE - grassWidth, count, endpoint=True).tolist()
+        ys = rng.integers(0, CHUNKSIZE - grassHeight, count, endpoint=True).tolist()
+        surface = pygame.Surface((CHUNKSIZE, CHUNKSIZE))
+        surface.fill(GRASSCOLOR)
+        surface.blits(
+            [(GRASSIMAGES[image], (x, y)) for image, x, y in zip(images, xs, ys)],
+            doreturn=False,
+        )
+        return surface
+
+    def chunksIn(self, left, top, width, height):
+        # The (x, y) chunk coordinates of the chunks overlapping a rect.
+        return [
+            (cx, cy)
+            for cx in range(left // CHUNKSIZE, (left + width - 1) // CHUNKSIZE + 1)
+            for cy in range(top // CHUNKSIZE, (top + height - 1) // CHUNKSIZE + 1)
+        ]
+
+    def update(self, camerax, cameray, squirrelField):
+        # Move the squirrels between squirrelField and the chunks as the
+        # active area moves.
+        x, y, width, height = (
+            squirrelField.FIELDS.index(name) for name in ("x", "y", "width", "height")
+        )
+        leaving = squirrelField.cull(camerax, cameray)
+        chunkxs = leaving[:, x] // CHUNKSIZE
+        chunkys = leaving[:, y] // CHUNKSIZE
+        for cx, cy in set(zip(chunkxs.tolist(), chunkys.tolist())):
+            rows = leaving[(chunkxs == cx) & (chunkys == cy)]
+            old = self.dormant.pop((cx, cy), None)
+            if old is not None:
+                rows = np.concatenate((old, rows))
+            self.dormant[(cx, cy)] = rows[-self.maxDormantPerChunk :]
+        while len(self.dormant) > MAXDORMANTCHUNKS:
+            self.dormant.popitem(last=False)
+
+        # Wake squirrels into the room left in the field, from the chunks
+        # nearest the camera first. Those in the camera view stay put until
+        # it has moved on, so no squirrel pops up on screen.
+        room = self.numSquirrels - len(squirrelField)
+        if room <= 0:
+            return
+        centerx = camerax + HALF_WINWIDTH
+        centery = cameray + HALF_WINHEIGHT
+        nearby = [
+            chunk
+            for chunk in self.chunksIn(
+                camerax - WINWIDTH, cameray - WINHEIGHT, WINWIDTH * 3, WINHEIGHT * 3
+            )
+            if chunk in self.dormant
+        ]
+        nearby.sort(
+            key=lambda chunk: abs((chunk[0] + 0.5) * CHUNKSIZE - centerx)
+            + abs((chunk[1] + 0.5) * CHUNKSIZE - centery)
+        )
+        for chunk in nearby:
+            rows = self.dormant[chunk]
+            xs, ys = rows[:, x], rows[:, y]
+            widths, heights = rows[:, width], rows[:, height]
+            waking = isInActiveArea(camerax, cameray, xs, ys, widths, heights) & ~(
+                (xs < camerax + WINWIDTH)
+                & (xs + widths > camerax)
+                & (ys - SQUIRRELMAXBOUNCE < cameray + WINHEIGHT)
+                & (ys + heights > cameray)
+            )
+            waking[np.cumsum(waking) > room] = False
+            if not waking.any():
+                continue
+            squirrelField.addRows(rows[waking])
+            room -= int(waking.sum())
+            if waking.all():
+                del self.dormant[chunk]
+            else:
+                self.dormant[chunk] = rows[~waking]
+            if room <= 0:
+                break
+
+    def draw(self, surface, camerax, cameray):
+        # One blit per chunk on screen.
+        blits = []
+        for chunk in self.chunksIn(camerax, cameray, WINWIDTH, WINHEIGHT):
+            position = (chunk[0] * CHUNKSIZE - camerax, chunk[1] * CHUNKSIZE - cameray)
+            blits.append((self.baked.get(chunk), position))
+        surface.blits(blits, doreturn=False)
 
 
 if __name__ == "__main__":
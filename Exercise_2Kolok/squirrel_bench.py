@@ -0,0 +1,138 @@
+# Microbenchmarks for Squirrel Eat Squirrel.
+#
+# Times pieces of squirrel.py in isolation, without a window, against the
+# simpler code they replaced (kept here for comparison).
+#
+#   spawn - placing new squirrels and grass around the camera view, inside
+#           or outside it: the old rejection loop against
+#           getPositionRelativeToCameraView.
+#   bounce - working out every squirrel's bounce for a frame: math.sin per
+#            squirrel and np.sin over all of them against the BOUNCETABLE
+#            lookup of getBounceAmounts.
+#
+# Usage: python -m Exercise_2Kolok.squirrel_bench
+#        python -m Exercise_2Kolok.squirrel_bench spawn --count 200000
+#        python -m Exercise_2Kolok.squirrel_bench bounce --count 5000
+
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import random
+import time
+
+import numpy as np
+import pygame
+
+from Exercise_2Kolok.squirrel import (
+    SQUIRRELMAXBOUNCE,
+    SQUIRRELMAXBOUNCERATE,
+    WINHEIGHT,
+    WINWIDTH,
+    calculateBounceAmount,
+    getBounceAmounts,
+    getPositionRelativeToCameraView,
+)
+
+
+def rejectionPosition(camerax, cameray, objWidth, objHeight, outside_camera):
+    # The old getPositionRelativeToCameraView: draw corners from the whole
+    # area until one lands on the right side of the camera view.
+    cameraRect = pygame.Rect(camerax, cameray, WINWIDTH, WINHEIGHT)
+    while True:
+        x = random.randint(camerax - WINWIDTH, camerax + (2 * WINWIDTH))
+        y = random.randint(cameray - WINHEIGHT, cameray + (2 * WINHEIGHT))
+        objRect = pygame.Rect(x, y, objWidth, objHeight)
+        if objRect.colliderect(cameraRect) != outside_camera:
+            return x, y
+
+
+def benchSpawn(count, seed):
+    random.seed(seed)
+    sizes = []
+    for _ in range(count):  # like makeNewSquirrel's
+        generalSize = random.randint(5, 25)
+        multiplier = random.randint(1, 3)
+        sizes.append(
+            (
+                (generalSize + random.randint(0, 10)) * multiplier,
+                (generalSize + random.randint(0, 10)) * multiplier,
+            )
+        )
+
+    print(f"{'placement':>10} {'rejection/s':>12} {'direct/s':>12} {'speedup':>8}")
+    for outside in (True, False):
+        times = []
+        for place in (rejectionPosition, getPositionRelativeToCameraView):
+            start = time.perf_counter()
+            for width, height in sizes:
+                place(0, 0, width, height, outside)
+            times.append(time.perf_counter() - start)
+        rejection, direct = times
+        print(
+            f"{'outside' if outside else 'inside':>10} {count / rejection:>12.0f} "
+            f"{count / direct:>12.0f} {rejection / direct:>7.1f}x"
+        )
+
+
+def sinBounceAmounts(bounces, bounceRates, bounceHeights):
+    # The old SquirrelField.bounceAmounts.
+    phase = (np.pi / bounceRates) * bounces
+    return (np.sin(phase) * bounceHeights).astype(np.int32)
+
+
+def benchBounce(count, seed, frames=20):
+    # count squirrels, each at some point of its bounce, as in SquirrelField.
+    rng = np.random.default_rng(seed)
+    rates = rng.integers(10, SQUIRRELMAXBOUNCERATE, count, endpoint=True, dtype=np.int32)
+    heights = rng.integers(10, SQUIRRELMAXBOUNCE, count, endpoint=True, dtype=np.int32)
+    bounces = (rng.random(count) * (rates + 1)).astype(np.int32)
+    args = (bounces, rates, heights)
+
+    def perSquirrel(bounces, rates, heights):
+        return [
+            calculateBounceAmount(*squirrel)
+            for squirrel in zip(bounces.tolist(), rates.tolist(), heights.tolist())
+        ]
+
+    expected = perSquirrel(*args)
+    print(f"{'method':>12} {'ms/frame':>10} {'speedup':>8}")
+    baseline = None
+    for name, bounceAmounts in (
+        ("math.sin", perSquirrel),
+        ("np.sin", sinBounceAmounts),
+        ("BOUNCETABLE", getBounceAmounts),
+    ):
+        if list(bounceAmounts(*args)) != expected:
+            raise AssertionError(f"{name} bounces differ from calculateBounceAmount")
+        start = time.perf_counter()
+        for _ in range(frames):
+            bounceAmounts(*args)
+        perFrame = (time.perf_counter() - start) / frames
+        baseline = baseline or perFrame
+        print(f"{name:>12} {perFrame * 1000:>10.3f} {baseline / perFrame:>7.1f}x")
+
+
+BENCHMARKS = {"spawn": benchSpawn, "bounce": benchBounce}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for Squirrel Eat Squirrel.")
+    parser.add_argument(
+        "benchmarks", nargs="*", metavar="benchmark", help=f"any of {', '.join(BENCHMARKS)}"
+    )
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r}")
+
+    for name in args.benchmarks or BENCHMARKS:
+        print(f"--- {name} ({args.count} objects)")
+        BENCHMARKS[name](args.count, args.seed)
+
+
+if __name__ == "__main__":
+    main()
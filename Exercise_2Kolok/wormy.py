@@ -21,9 +21,12 @@
 #   When the user clicks the first button, the game should start over (without showing the starting screen).
 #   When the player clicks the second button, the game should terminate.
 
+import argparse
 import random
 import pygame
 import sys
+from array import array
+from collections import deque
 from pygame.locals import (
     QUIT,
     KEYDOWN,
@@ -36,8 +39,12 @@ from pygame.locals import (
     K_a,
     K_s,
     K_d,
+    K_p,
     K_w,
 )
+from common.hud import Label, get_font
+from common.scheduler import Scheduler
+from Exercise_2Kolok.wormy_ai import Pathfinder, Wanderer
 
 FPS = 10
 WINDOWWIDTH = 640
@@ -66,213 +73,559 @@ DOWN = "down"
 LEFT = "left"
 RIGHT = "right"
 
-HEAD = 0  # syntactic sugar: index of the worm's head
+# How a step in each direction changes (x, y).
+DIRECTIONDELTAS = {UP: (0, -1), DOWN: (0, 1), LEFT: (-1, 0), RIGHT: (1, 0)}
 MILLISECONDS = 1000
 GAME_SPEED_INCREMENT_AMOUNT = 5
 
 YELLOW_APPLE_TIME_LIMIT = 2 * MILLISECONDS
 BLUE_APPLE_TIME_LIMIT = 2 * MILLISECONDS
 GAME_SPEED_INCREMENT_TIME_LIMIT = 10 * MILLISECONDS
+MAX_TICK_TIME = 250  # a longer gap between ticks (a stalled window) counts as this
+
+# Boards bigger than the window scroll to keep the player's head at least
+# this many cells away from the edges of the screen.
+CAMERA_MARGIN = 4
+
+AUTOPILOT_BUDGET = 0.002  # seconds of pathfinding per frame for the autopilot
+OTHER_WORM_SEARCH_NODES = 2048  # cells searched per tick for the purple worm
+
+
+class FreeCells:
+    # The set of cell indices not covered by any worm, kept as a packed array
+    # plus each cell's position in it. Adding, removing (by swapping with the
+    # last entry) and picking a random free cell are all O(1), however full
+    # the board is.
+
+    def __init__(self, size):
+        self.cells = array("i", range(size))
+        self.positions = array("i", range(size))  # -1 if the cell is not free
+        self.count = size
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, index):
+        return self.positions[index] != -1
+
+    def add(self, index):
+        self.cells[self.count] = index
+        self.positions[index] = self.count
+        self.count += 1
+
+    def remove(self, index):
+        position = self.positions[index]
+        self.count -= 1
+        last = self.cells[self.count]
+        self.cells[position] = last
+        self.positions[last] = position
+        self.positions[index] = -1
+
+    def sample(self, rng=random):
+        if self.count == 0:
+            return None
+        return self.cells[rng.randrange(self.count)]
+
+
+class Board:
+    # The cells shared by all the worms: how many worm segments cover each
+    # cell, and which cells are free for placing apples.
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.occupancy = bytearray(width * height)
+        self.free = FreeCells(width * height)
+        self.changed = None  # a set collecting changed cells, if someone draws them
+
+    def occupy(self, index):
+        if self.occupancy[index] == 0:
+            self.free.remove(index)
+        self.occupancy[index] += 1
+        if self.changed is not None:
+            self.changed.add(index)
+
+    def vacate(self, index):
+        self.occupancy[index] -= 1
+        if self.occupancy[index] == 0:
+            self.free.add(index)
+        if self.changed is not None:
+            self.changed.add(index)
+
+    def randomFreeCell(self, rng=random):
+        # Returns (x, y) of a cell no worm is on, or None if there is none.
+        index = self.free.sample(rng)
+        if index is None:
+            return None
+        y, x = divmod(index, self.width)
+        return (x, y)
+
+
+class Worm:
+    # A worm on a board that wraps around at the edges. The body is a deque
+    # of packed cell indices (y * width + x), head first, and occupancy counts
+    # this worm's segments on every cell, so adding a head, removing the tail
+    # and checking for collisions are all O(1) however long the worm gets.
+    # Worms that never check for collisions with themselves can do without
+    # their own occupancy (ownOccupancy=False), which saves a byte per cell
+    # of the board for every worm in a big arena.
+
+    def __init__(self, board, coords, direction=RIGHT, ownOccupancy=True):
+        self.board = board
+        self.width = board.width
+        self.height = board.height
+        self.direction = direction
+        self.body = deque()
+        self.occupancy = bytearray(board.width * board.height) if ownOccupancy else None
+        for x, y in coords:
+            index = y * self.width + x
+            self.body.append(index)
+            if self.occupancy is not None:
+                self.occupancy[index] += 1
+            board.occupy(index)
+
+    def __len__(self):
+        return len(self.body)
+
+    def head(self):
+        y, x = divmod(self.body[0], self.width)
+        return (x, y)
+
+    def coords(self):
+        width = self.width
+        for index in self.body:
+            y, x = divmod(index, width)
+            yield (x, y)
+
+    def addHead(self, direction):
+        # Move the head one cell, coming back in on the opposite edge.
+        x, y = self.head()
+        dx, dy = DIRECTIONDELTAS[direction]
+        index = (y + dy) % self.height * self.width + (x + dx) % self.width
+        self.body.appendleft(index)
+        if self.occupancy is not None:
+            self.occupancy[index] += 1
+        self.board.occupy(index)
+
+    def removeTail(self):
+        index = self.body.pop()
+        if self.occupancy is not None:
+            self.occupancy[index] -= 1
+        self.board.vacate(index)
+
+    def occupies(self, coord):
+        x, y = coord
+        return self.occupancy[y * self.width + x] > 0
+
+    def hitItself(self):
+        return self.occupancy[self.body[0]] > 1
 
 
 def main():
-    global FPSCLOCK, DISPLAYSURF, BASICFONT
+    global FPSCLOCK, DISPLAYSURF, BASICFONT, SCORELABEL, AUTOPILOTSURF
 
+    args = parseArgs()
     pygame.init()
     FPSCLOCK = pygame.time.Clock()
     DISPLAYSURF = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
-    BASICFONT = pygame.font.Font("freesansbold.ttf", 18)
+    BASICFONT = get_font("freesansbold.ttf", 18)
+    SCORELABEL = Label(BASICFONT, "Score: {}", WHITE)
+    AUTOPILOTSURF = BASICFONT.render("Autopilot (P)", True, WHITE)
     pygame.display.set_caption("Wormy")
+    makeSurfaces()
 
     showStartScreen()
     while True:
-        runGame()
+        runGame(args.board[0], args.board[1], args.worms)
         showGameOverScreen()
 
 
-def runGame():
-    global FPS
-    # Set a random start point.
-    player_start_x = random.randint(5, CELLWIDTH - 6)
-    player_start_y = random.randint(5, CELLHEIGHT - 6)
-    player_wormCoords = [
-        {"x": player_start_x, "y": player_start_y},
-        {"x": player_start_x - 1, "y": player_start_y},
-        {"x": player_start_x - 2, "y": player_start_y},
-    ]
-
-    other_worm_start_x = random.randint(5, CELLWIDTH - 6)
-    other_worm_start_y = random.randint(5, CELLHEIGHT - 6)
-    other_wormCoords = [
-        {"x": other_worm_start_x, "y": other_worm_start_y},
-        {"x": other_worm_start_x - 1, "y": other_worm_start_y},
-        {"x": other_worm_start_x - 2, "y": other_worm_start_y},
-        {"x": other_worm_start_x - 3, "y": other_worm_start_y},
-    ]
-
-    player_direction = RIGHT
-    game_score = 0
-
-    # Start the apple in a random place.
-    red_apple = getRandomLocation()
-    yellow_apple = getRandomLocation()
-    blue_apple = getRandomLocation()
-
-    yellow_apple_timer = 0
-    blue_apple_timer = 0
-    game_timer = 0
-
-    while True:  # main game loop
-        for event in pygame.event.get():  # event handling loop
-            if event.type == QUIT:
-                terminate()
-            elif event.type == KEYDOWN:
-                if (
-                    event.key == K_LEFT or event.key == K_a
-                ) and player_direction != RIGHT:
-                    player_direction = LEFT
-                elif (
-                    event.key == K_RIGHT or event.key == K_d
-                ) and player_direction != LEFT:
-                    player_direction = RIGHT
-                elif (
-                    event.key == K_UP or event.key == K_w
-                ) and player_direction != DOWN:
-                    player_direction = UP
-                elif (
-                    event.key == K_DOWN or event.key == K_s
-                ) and player_direction != UP:
-                    player_direction = DOWN
-                elif event.key == K_ESCAPE:
-                    terminate()
-
-        yellow_apple_timer += FPSCLOCK.get_time()
-        blue_apple_timer += FPSCLOCK.get_time()
-        game_timer += FPSCLOCK.get_time()
+def parseArgs():
+    parser = argparse.ArgumentParser(description="Wormy")
+    parser.add_argument(
+        "--board",
+        type=parseBoardSize,
+        default=(CELLWIDTH, CELLHEIGHT),
+        metavar="WxH",
+        help="board size in cells; boards bigger than the window scroll",
+    )
+    parser.add_argument(
+        "--worms", type=int, default=1, help="number of purple worms"
+    )
+    return parser.parse_args()
+
+
+def parseBoardSize(text):
+    try:
+        width, height = (int(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}")
+    if width < 11 or height < 11:
+        raise argparse.ArgumentTypeError("the board must be at least 11x11 cells")
+    return (width, height)
+
+
+# Keys that turn the player's worm.
+KEYDIRECTIONS = {
+    K_LEFT: LEFT,
+    K_a: LEFT,
+    K_RIGHT: RIGHT,
+    K_d: RIGHT,
+    K_UP: UP,
+    K_w: UP,
+    K_DOWN: DOWN,
+    K_s: DOWN,
+}
+OPPOSITE = {UP: DOWN, DOWN: UP, LEFT: RIGHT, RIGHT: LEFT}
+
+
+class GameState:
+    # Everything about one game, advanced a tick at a time by step(). It
+    # never touches the display, the event queue or the clock: randomness
+    # comes from rng and time from the elapsed milliseconds passed to step(),
+    # so games can be run headlessly (see wormy_sim.py). Timed changes are
+    # callbacks on the game's own scheduler, which step() advances.
+
+    def __init__(self, rng=None, width=CELLWIDTH, height=CELLHEIGHT, otherWorms=1):
+        self.rng = rng or random.Random()
+        self.board = Board(width, height)
+
+        # Set a random start point.
+        player_start_x = self.rng.randint(5, width - 6)
+        player_start_y = self.rng.randint(5, height - 6)
+        self.player_worm = Worm(
+            self.board,
+            [(player_start_x - i, player_start_y) for i in range(3)],
+        )
+
+        # The purple worms wander around the board without running into
+        # anything. Their searches are limited by nodes, not time, so a game
+        # plays out the same way on any machine.
+        self.other_worms = []
+        self.other_worm_ais = []
+        for _ in range(otherWorms):
+            other_worm_start_x = self.rng.randint(5, width - 6)
+            other_worm_start_y = self.rng.randint(5, height - 6)
+            self.other_worms.append(
+                Worm(
+                    self.board,
+                    [(other_worm_start_x - i, other_worm_start_y) for i in range(4)],
+                    ownOccupancy=False,
+                )
+            )
+            self.other_worm_ais.append(
+                Wanderer(
+                    self.board,
+                    DIRECTIONDELTAS,
+                    self.rng,
+                    budget=None,
+                    maxNodes=OTHER_WORM_SEARCH_NODES,
+                    sparse=True,
+                )
+            )
+
+        self.player_direction = RIGHT
+        self.game_score = 0
+        self.fps = FPS  # the game speed, in ticks per second
+        self.ticks = 0
+        self.events = []  # what happened during the last tick, e.g. "red"
+
+        # Start the apple in a random place.
+        self.red_apple = getRandomLocation(self.board, self.rng)
+        self.yellow_apple = getRandomLocation(self.board, self.rng)
+        self.blue_apple = getRandomLocation(self.board, self.rng)
+
+        self.scheduler = Scheduler()
+        self.yellow_apple_timer = self.scheduler.call_every(
+            YELLOW_APPLE_TIME_LIMIT, self.moveYellowApple
+        )
+        self.blue_apple_timer = self.scheduler.call_every(
+            BLUE_APPLE_TIME_LIMIT, self.moveBlueApple
+        )
+        self.game_timer = self.scheduler.call_every(
+            GAME_SPEED_INCREMENT_TIME_LIMIT, self.speedUp
+        )
+
+    def moveYellowApple(self):
+        self.yellow_apple = getRandomLocation(self.board, self.rng)
+
+    def moveBlueApple(self):
+        self.blue_apple = getRandomLocation(self.board, self.rng)
+
+    def speedUp(self):
+        self.fps += GAME_SPEED_INCREMENT_AMOUNT
+        self.events.append("faster")
+
+    def turn(self, direction):
+        # The worm can't turn straight back into itself.
+        if direction != OPPOSITE[self.player_direction]:
+            self.player_direction = direction
+
+    def step(self, direction=None, elapsed=None):
+        # Advance the game by one tick, turning the player's worm first if
+        # direction is given. elapsed is the milliseconds since the last tick
+        # (one tick at the current speed by default). Returns False once the
+        # game is over.
+        if direction is not None:
+            self.turn(direction)
+        if elapsed is None:
+            elapsed = MILLISECONDS // self.fps
+        events = self.events
+        events.clear()
+        self.ticks += 1
+        board = self.board
+        player_worm = self.player_worm
+        scheduler = self.scheduler
+
+        scheduler.advance(min(elapsed, MAX_TICK_TIME))
+
+        # Worms wrap around at the edges (baranje 1), see Worm.addHead.
+        if player_worm.hitItself():
+            events.append("gameover")
+            return False
+
+        if player_worm.head() == self.red_apple:
+            self.red_apple = getRandomLocation(board, self.rng)
+            self.game_score += 1
+            events.append("red")
+        else:
+            player_worm.removeTail()
 
-        if yellow_apple_timer >= YELLOW_APPLE_TIME_LIMIT:
-            yellow_apple = getRandomLocation()
-            yellow_apple_timer = 0
+        # Baranje 2
+        if player_worm.head() == self.yellow_apple:
+            self.yellow_apple = getRandomLocation(board, self.rng)
+            scheduler.reschedule(self.yellow_apple_timer)
+            player_worm.removeTail()
+            events.append("yellow")
+            if len(player_worm) == 0:
+                events.append("gameover")
+                return False
 
-        if blue_apple_timer >= BLUE_APPLE_TIME_LIMIT:
-            blue_apple = getRandomLocation()
-            blue_apple_timer = 0
+        # B3
+        if player_worm.head() == self.blue_apple:
+            self.blue_apple = getRandomLocation(board, self.rng)
+            scheduler.reschedule(self.blue_apple_timer)
+            events.append("blue")
+            if self.fps > 2 * GAME_SPEED_INCREMENT_AMOUNT:
+                self.fps -= GAME_SPEED_INCREMENT_AMOUNT
 
-        if game_timer >= GAME_SPEED_INCREMENT_TIME_LIMIT:
-            game_timer = 0
-            FPS += GAME_SPEED_INCREMENT_AMOUNT
+        # move the worm by adding a segment in the direction it is moving
+        player_worm.addHead(self.player_direction)
 
-        # Check for each edge (baranje 1)
-        if player_wormCoords[HEAD]["x"] == -1:
-            player_wormCoords[HEAD]["x"] = CELLWIDTH - 1
+        for other_worm, ai in zip(self.other_worms, self.other_worm_ais):
+            other_worm.direction = ai.chooseDirection(other_worm, other_worm.direction)
+            other_worm.addHead(other_worm.direction)
+            other_worm.removeTail()
+        return True
 
-        if player_wormCoords[HEAD]["x"] == CELLWIDTH:
-            player_wormCoords[HEAD]["x"] = 0
+    def otherHeads(self):
+        return [other_worm.head() for other_worm in self.other_worms]
 
-        if player_wormCoords[HEAD]["y"] == -1:
-            player_wormCoords[HEAD]["y"] = CELLHEIGHT - 1
 
-        if player_wormCoords[HEAD]["y"] == CELLHEIGHT:
-            player_wormCoords[HEAD]["y"] = 0
+def runGame(width=CELLWIDTH, height=CELLHEIGHT, otherWorms=1):
+    state = GameState(width=width, height=height, otherWorms=otherWorms)
+    renderer = Renderer(state)
+    autopilot = None  # a Pathfinder while P has switched the autopilot on
 
-        for wormBody in player_wormCoords[1:]:
-            if (
-                wormBody["x"] == player_wormCoords[HEAD]["x"]
-                and wormBody["y"] == player_wormCoords[HEAD]["y"]
-            ):
-                return  # game over
+    while True:  # main game loop
+        for event in pygame.event.get():  # event handling loop
+            if event.type == QUIT:
+                terminate()
+            elif event.type == KEYDOWN:
+                if event.key in KEYDIRECTIONS:
+                    state.turn(KEYDIRECTIONS[event.key])
+                elif event.key == K_p:
+                    if autopilot is None:
+                        autopilot = Pathfinder(state.board, DIRECTIONDELTAS, AUTOPILOT_BUDGET)
+                    else:
+                        autopilot = None
+                    renderer.fullRedraw = True
+                elif event.key == K_ESCAPE:
+                    terminate()
 
-        if (
-            player_wormCoords[HEAD]["x"] == red_apple["x"]
-            and player_wormCoords[HEAD]["y"] == red_apple["y"]
+        direction = None
+        if autopilot is not None:
+            direction = autopilot.chooseDirection(
+                state.player_worm,
+                state.red_apple,
+                state.player_direction,
+                avoid=state.otherHeads(),
+            )
+        if not state.step(direction, elapsed=FPSCLOCK.get_time()):
+            return  # game over
+
+        pygame.display.update(renderer.draw(autopilot is not None))
+        FPSCLOCK.tick(state.fps)
+
+
+class Renderer:
+    # Draws a game onto DISPLAYSURF, after the first frame redrawing only the
+    # cells that changed since the last one: the board records every cell a
+    # worm enters or leaves, and apples are compared with where they were
+    # drawn. Each cell is restored from the pre-rendered BACKGROUND and gets
+    # whatever is on top of it (an apple, else a purple worm, else the
+    # player's worm), so a tick costs the same on any board with any worms.
+    #
+    # A board bigger than the window is seen through a camera: the window
+    # shows the cells from camera (x, y) on, wrapping around like the board,
+    # and the camera jumps to re-center the player's head when it gets
+    # within CAMERA_MARGIN cells of the edge. Only visible cells are drawn.
+
+    def __init__(self, state):
+        self.state = state
+        board = state.board
+        board.changed = set()
+        self.viewWidth = min(CELLWIDTH, board.width)
+        self.viewHeight = min(CELLHEIGHT, board.height)
+        self.camera = (0, 0)
+        self.fullRedraw = True
+        self.drawnApples = {}
+        self.drawnScore = None
+        self.scoreRect = None  # where the score was last drawn
+        self.scoreCells = set()  # the cells under the score
+        self.autopilotRect = AUTOPILOTSURF.get_rect(topleft=(10, 10))
+        self.autopilotCells = set()
+        self.followHead()
+
+    def followHead(self):
+        board = self.state.board
+        width, height = board.width, board.height
+        camerax, cameray = self.camera
+        headx, heady = self.state.player_worm.head()
+        if width > self.viewWidth:
+            screenx = (headx - camerax) % width
+            if not CAMERA_MARGIN <= screenx < self.viewWidth - CAMERA_MARGIN:
+                camerax = (headx - self.viewWidth // 2) % width
+        if height > self.viewHeight:
+            screeny = (heady - cameray) % height
+            if not CAMERA_MARGIN <= screeny < self.viewHeight - CAMERA_MARGIN:
+                cameray = (heady - self.viewHeight // 2) % height
+        if (camerax, cameray) != self.camera:
+            self.camera = (camerax, cameray)
+            self.fullRedraw = True
+
+    def visibleCells(self, left=0, top=0, right=None, bottom=None):
+        # Board indices of the cells shown in the given range of screen cells
+        # (by default the whole window).
+        board = self.state.board
+        width, height = board.width, board.height
+        camerax, cameray = self.camera
+        right = self.viewWidth - 1 if right is None else min(right, self.viewWidth - 1)
+        bottom = self.viewHeight - 1 if bottom is None else min(bottom, self.viewHeight - 1)
+        columns = [(camerax + x) % width for x in range(max(left, 0), right + 1)]
+        return [
+            (cameray + y) % height * width + column
+            for y in range(max(top, 0), bottom + 1)
+            for column in columns
+        ]
+
+    def cellsInRect(self, rect):
+        # Board indices of the visible cells that the screen rect overlaps.
+        return self.visibleCells(
+            rect.left // CELLSIZE,
+            rect.top // CELLSIZE,
+            (rect.right - 1) // CELLSIZE,
+            (rect.bottom - 1) // CELLSIZE,
+        )
+
+    def apples(self):
+        # Cell index -> color; later apples are drawn over earlier ones.
+        state = self.state
+        width = state.board.width
+        apples = {}
+        for coord, color in (
+            (state.red_apple, RED),
+            (state.yellow_apple, YELLOW),
+            (state.blue_apple, BLUE),
         ):
-            red_apple = getRandomLocation()
-            game_score += 1
+            if coord is not None:
+                apples[coord[1] * width + coord[0]] = color
+        return apples
+
+    def draw(self, autopilot=False):
+        # Draw the changes and return the rects to pass to display.update().
+        state = self.state
+        changed = state.board.changed
+        apples = self.apples()
+        self.followHead()
+        fullRedraw = self.fullRedraw
+        if fullRedraw:
+            DISPLAYSURF.blit(BACKGROUND, (0, 0))
+            occupancy = state.board.occupancy
+            changed.clear()
+            changed.update(
+                index for index in self.visibleCells() if occupancy[index] or index in apples
+            )
+            self.autopilotCells = set(self.cellsInRect(self.autopilotRect))
+        if apples != self.drawnApples:
+            changed.update(self.drawnApples, apples)
+            self.drawnApples = apples
+
+        # Text goes on top of the cells. When any cell under it changes, all
+        # of them are redrawn, as drawing text over itself would smear it.
+        redrawScore = (
+            fullRedraw
+            or state.game_score != self.drawnScore
+            or not changed.isdisjoint(self.scoreCells)
+        )
+        if redrawScore and not fullRedraw:
+            changed.update(self.scoreCells)
+        redrawAutopilot = autopilot and (
+            fullRedraw or not changed.isdisjoint(self.autopilotCells)
+        )
+        if redrawAutopilot and not fullRedraw:
+            changed.update(self.autopilotCells)
+
+        # The old text is wiped off with the background before the cells
+        # under it are redrawn: on a board narrower than the window some of
+        # it may lie beyond the cells.
+        rects = []
+        if redrawScore and not fullRedraw and self.scoreRect is not None:
+            DISPLAYSURF.blit(BACKGROUND, self.scoreRect, self.scoreRect)
+            rects.append(self.scoreRect)
+        if redrawAutopilot and not fullRedraw:
+            DISPLAYSURF.blit(BACKGROUND, self.autopilotRect, self.autopilotRect)
+        for index in changed:
+            cellRect = self.drawCell(index, apples)
+            if cellRect is not None:
+                rects.append(cellRect)
+        changed.clear()
+
+        if redrawScore:
+            self.drawnScore = state.game_score
+            self.scoreRect = drawScore(state.game_score)
+            self.scoreCells = set(self.cellsInRect(self.scoreRect))
+            rects.append(self.scoreRect)
+        if redrawAutopilot:
+            DISPLAYSURF.blit(AUTOPILOTSURF, self.autopilotRect)
+            rects.append(self.autopilotRect)
+
+        if fullRedraw:
+            self.fullRedraw = False
+            return [DISPLAYSURF.get_rect()]
+        return rects
+
+    def drawCell(self, index, apples):
+        # Returns the cell's rect on the screen, or None if it isn't visible.
+        state = self.state
+        board = state.board
+        y, x = divmod(index, board.width)
+        camerax, cameray = self.camera
+        screenx = (x - camerax) % board.width
+        screeny = (y - cameray) % board.height
+        if screenx >= self.viewWidth or screeny >= self.viewHeight:
+            return None
+        cellRect = pygame.Rect(screenx * CELLSIZE, screeny * CELLSIZE, CELLSIZE, CELLSIZE)
+        playerSegments = state.player_worm.occupancy[index]
+        if index in apples:
+            pygame.draw.rect(DISPLAYSURF, apples[index], cellRect)
+        elif board.occupancy[index] > playerSegments:
+            DISPLAYSURF.blit(OTHERSEGMENTSURF, cellRect)
+        elif playerSegments:
+            DISPLAYSURF.blit(PLAYERSEGMENTSURF, cellRect)
         else:
-            del player_wormCoords[-1]
-
-        # Baranje 2
-        if (
-            player_wormCoords[HEAD]["x"] == yellow_apple["x"]
-            and player_wormCoords[HEAD]["y"] == yellow_apple["y"]
-        ):
-            yellow_apple = getRandomLocation()
-            yellow_apple_timer = 0
-            del player_wormCoords[-1]
-            if len(player_wormCoords) == 0:
-                return
-
-        # B3
-        if (
-            player_wormCoords[HEAD]["x"] == blue_apple["x"]
-            and player_wormCoords[HEAD]["y"] == blue_apple["y"]
-        ):
-            blue_apple = getRandomLocation()
-            blue_apple_timer = 0
-            if FPS > 2 * GAME_SPEED_INCREMENT_AMOUNT:
-                FPS -= GAME_SPEED_INCREMENT_AMOUNT
-
-        # move the worm by adding a segment in the direction it is moving
-        if player_direction == UP:
-            newHead = {
-                "x": player_wormCoords[HEAD]["x"],
-                "y": player_wormCoords[HEAD]["y"] - 1,
-            }
-        elif player_direction == DOWN:
-            newHead = {
-                "x": player_wormCoords[HEAD]["x"],
-                "y": player_wormCoords[HEAD]["y"] + 1,
-            }
-        elif player_direction == LEFT:
-            newHead = {
-                "x": player_wormCoords[HEAD]["x"] - 1,
-                "y": player_wormCoords[HEAD]["y"],
-            }
-        elif player_direction == RIGHT:
-            newHead = {
-                "x": player_wormCoords[HEAD]["x"] + 1,
-                "y": player_wormCoords[HEAD]["y"],
-            }
-
-        worm_direction = random.choice([UP, DOWN, LEFT, RIGHT])
-        if worm_direction == UP:
-            other_worm_new_head = {
-                "x": other_wormCoords[HEAD]["x"],
-                "y": other_wormCoords[HEAD]["y"] - 1,
-            }
-        elif worm_direction == DOWN:
-            other_worm_new_head = {
-                "x": other_wormCoords[HEAD]["x"],
-                "y": other_wormCoords[HEAD]["y"] + 1,
-            }
-        elif worm_direction == LEFT:
-            other_worm_new_head = {
-                "x": other_wormCoords[HEAD]["x"] - 1,
-                "y": other_wormCoords[HEAD]["y"],
-            }
-        elif worm_direction == RIGHT:
-            other_worm_new_head = {
-                "x": other_wormCoords[HEAD]["x"] + 1,
-                "y": other_wormCoords[HEAD]["y"],
-            }
-
-        player_wormCoords.insert(0, newHead)
-
-        other_wormCoords.insert(0, other_worm_new_head)
-        del other_wormCoords[-1]
-
-        DISPLAYSURF.fill(BGCOLOR)
-        drawGrid()
-        drawWorm(player_wormCoords, GREEN, DARKGREEN)
-        drawWorm(other_wormCoords, PURPLE, DARKPURPLE)
-
-        drawApple(red_apple, RED)
-        drawApple(yellow_apple, YELLOW)
-        drawApple(blue_apple, BLUE)
-
-        drawScore(game_score)
-        pygame.display.update()
-        FPSCLOCK.tick(FPS)
+            DISPLAYSURF.blit(BACKGROUND, cellRect, cellRect)
+        return cellRect
 
 
 def drawPressKeyMsg():
@@ -295,7 +648,7 @@ def checkForKeyPress():
 
 
 def showStartScreen():
-    titleFont = pygame.font.Font("freesansbold.ttf", 100)
+    titleFont = get_font("freesansbold.ttf", 100)
     titleSurf1 = titleFont.render("Wormy!", True, WHITE, DARKGREEN)
     titleSurf2 = titleFont.render("Wormy!", True, GREEN)
 
@@ -329,15 +682,13 @@ def terminate():
     sys.exit()
 
 
-def getRandomLocation():
-    return {
-        "x": random.randint(0, CELLWIDTH - 1),
-        "y": random.randint(0, CELLHEIGHT - 1),
-    }
+def getRandomLocation(board, rng=random):
+    # A cell that no worm is on, or None when the worms cover the whole board.
+    return board.randomFreeCell(rng)
 
 
 def showGameOverScreen():
-    gameOverFont = pygame.font.Font("freesansbold.ttf", 150)
+    gameOverFont = get_font("freesansbold.ttf", 150)
     gameSurf = gameOverFont.render("Game", True, WHITE)
     overSurf = gameOverFont.render("Over", True, WHITE)
     gameRect = gameSurf.get_rect()
@@ -359,34 +710,33 @@ def showGameOverScreen():
 
 
 def drawScore(score):
-    scoreSurf = BASICFONT.render("Score: %s" % (score), True, WHITE)
-    scoreRect = scoreSurf.get_rect()
-    scoreRect.topleft = (WINDOWWIDTH - 120, 10)
-    DISPLAYSURF.blit(scoreSurf, scoreRect)
+    return SCORELABEL.draw(DISPLAYSURF, score, topleft=(WINDOWWIDTH - 120, 10))
 
 
-def drawWorm(wormCoords, color, dark_color):
-    for coord in wormCoords:
-        x = coord["x"] * CELLSIZE
-        y = coord["y"] * CELLSIZE
-        wormSegmentRect = pygame.Rect(x, y, CELLSIZE, CELLSIZE)
-        pygame.draw.rect(DISPLAYSURF, dark_color, wormSegmentRect)
-        wormInnerSegmentRect = pygame.Rect(x + 4, y + 4, CELLSIZE - 8, CELLSIZE - 8)
-        pygame.draw.rect(DISPLAYSURF, color, wormInnerSegmentRect)
+def makeSurfaces():
+    # Pre-render the grid and a worm segment of each color, so a frame is
+    # only blits.
+    global BACKGROUND, PLAYERSEGMENTSURF, OTHERSEGMENTSURF
+    BACKGROUND = pygame.Surface((WINDOWWIDTH, WINDOWHEIGHT)).convert()
+    BACKGROUND.fill(BGCOLOR)
+    drawGrid(BACKGROUND)
+    PLAYERSEGMENTSURF = makeSegment(GREEN, DARKGREEN)
+    OTHERSEGMENTSURF = makeSegment(PURPLE, DARKPURPLE)
 
 
-def drawApple(coord, color):
-    x = coord["x"] * CELLSIZE
-    y = coord["y"] * CELLSIZE
-    appleRect = pygame.Rect(x, y, CELLSIZE, CELLSIZE)
-    pygame.draw.rect(DISPLAYSURF, color, appleRect)
+def makeSegment(color, dark_color):
+    segmentSurf = pygame.Surface((CELLSIZE, CELLSIZE)).convert()
+    segmentSurf.fill(dark_color)
+    wormInnerSegmentRect = pygame.Rect(4, 4, CELLSIZE - 8, CELLSIZE - 8)
+    pygame.draw.rect(segmentSurf, color, wormInnerSegmentRect)
+    return segmentSurf
 
 
-def drawGrid():
+def drawGrid(surface):
     for x in range(0, WINDOWWIDTH, CELLSIZE):  # draw vertical lines
-        pygame.draw.line(DISPLAYSURF, DARKGRAY, (x, 0), (x, WINDOWHEIGHT))
+        pygame.draw.line(surface, DARKGRAY, (x, 0), (x, WINDOWHEIGHT))
     for y in range(0, WINDOWHEIGHT, CELLSIZE):  # draw horizontal lines
-        pygame.draw.line(DISPLAYSURF, DARKGRAY, (0, y), (WINDOWWIDTH, y))
+        pygame.draw.line(surface, DARKGRAY, (0, y), (WINDOWWIDTH, y))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,212 @@
+# Pathfinding for Wormy worms.
+#
+# The board wraps around at the edges, so it is searched as a torus. A
+# Pathfinder keeps a breadth-first distance field grown outwards from its
+# target: once built, the distance from every cell is known, so the field is
+# reused tick after tick until the target moves or the field gets too old
+# for the worms that have moved since. The search only goes as far as the
+# worm's head (cells further out are found later, if the worm ever gets
+# there), and is spread over as many ticks as needed by a per-tick time (or
+# node) budget, so big boards never stall a frame; until the field reaches
+# the worm it steers by the wrapped Manhattan distance instead.
+#
+# The module only needs a board with width, height and an occupancy count
+# per cell, a worm with head(), and a mapping of direction -> (dx, dy), so
+# it works with any direction names (see wormy.DIRECTIONDELTAS).
+
+import random
+import time
+from array import array
+from collections import deque
+
+UNKNOWN = -1  # distance of cells the search has not reached (yet)
+MAXFIELDAGE = 20  # ticks a distance field is used before it is rebuilt
+
+
+class SparseDistances(dict):
+    # Distances of only the cells reached so far, for searches that stay
+    # local on a big board.
+
+    def __missing__(self, index):
+        return UNKNOWN
+
+
+class DistanceField:
+    # Distances from target to every free cell of the board, found by a
+    # breadth-first search that can be paused and resumed. A dense field is
+    # an array with an entry per cell of the board; a sparse one (for short
+    # searches on big boards) is a dict of the cells reached.
+
+    def __init__(self, board, target, sparse=False):
+        self.board = board
+        self.target = target
+        self.width = board.width
+        self.height = board.height
+        x, y = target
+        start = y * self.width + x
+        if sparse:
+            self.distance = SparseDistances()
+        else:
+            self.distance = array("i", [UNKNOWN]) * (self.width * self.height)
+        self.distance[start] = 0
+        self.frontier = deque([start])
+        self.age = 0  # ticks the field has been steered by
+
+    def expand(self, goal=None, deadline=None, maxNodes=None):
+        # Search until the distance of cell index goal is known (or every
+        # reachable cell if goal is None), time.perf_counter() passes
+        # deadline or maxNodes cells have been expanded.
+        width = self.width
+        lastRow = (self.height - 1) * width
+        occupancy = self.board.occupancy
+        distance = self.distance
+        frontier = self.frontier
+        nodes = 0
+        while frontier:
+            if goal is not None and distance[goal] != UNKNOWN:
+                break
+            if maxNodes is not None and nodes >= maxNodes:
+                break
+            if deadline is not None and nodes & 255 == 0 and time.perf_counter() > deadline:
+                break
+            nodes += 1
+            index = frontier.popleft()
+            step = distance[index] + 1
+            x = index % width
+            for neighbor in (
+                index - x + (x - 1) % width,  # left
+                index - x + (x + 1) % width,  # right
+                index - width if index >= width else index + lastRow,  # up
+                index + width if index < lastRow else index - lastRow,  # down
+            ):
+                if distance[neighbor] != UNKNOWN:
+                    continue
+                if not occupancy[neighbor]:
+                    distance[neighbor] = step
+                    frontier.append(neighbor)
+                elif neighbor == goal:  # the worm's head, which is never free
+                    distance[neighbor] = step
+        return nodes
+
+
+class Pathfinder:
+    # Steers a worm to a target cell along the distance field, never into an
+    # occupied cell and never straight back into itself. Cells next to the
+    # heads of other worms are avoided when there is any other choice.
+
+    def __init__(
+        self,
+        board,
+        deltas,
+        budget=0.002,
+        maxNodes=None,
+        maxAge=MAXFIELDAGE,
+        sparse=False,
+        rng=None,
+    ):
+        self.board = board
+        self.deltas = deltas
+        self.budget = budget  # seconds of searching per tick, None for no limit
+        self.maxNodes = maxNodes  # cells expanded per tick, None for no limit
+        self.maxAge = maxAge
+        self.sparse = sparse  # see DistanceField
+        self.rng = rng or random.Random()
+        self.field = None
+
+    def distanceField(self, target, head):
+        field = self.field
+        if field is None or field.target != target or field.age > self.maxAge:
+            field = self.field = DistanceField(self.board, target, self.sparse)
+        x, y = head
+        goal = y * field.width + x
+        deadline = None if self.budget is None else time.perf_counter() + self.budget
+        field.expand(goal, deadline, self.maxNodes)
+        if field.distance[goal] != UNKNOWN:
+            field.age += 1  # only count ticks once the field is any use
+        return field
+
+    def chooseDirection(self, worm, target, current=None, avoid=()):
+        # The direction to move worm in this tick. target is an (x, y) cell or
+        # None to just stay safe, current the direction the worm is going and
+        # avoid the (x, y) heads of other worms.
+        board = self.board
+        width, height = board.width, board.height
+        occupancy = board.occupancy
+        x, y = worm.head()
+        field = self.distanceField(target, (x, y)) if target is not None else None
+        back = None
+        if current is not None:
+            dx, dy = self.deltas[current]
+            back = (-dx, -dy)
+        risky = set()
+        for ax, ay in avoid:
+            for dx, dy in self.deltas.values():
+                risky.add(((ax + dx) % width, (ay + dy) % height))
+
+        best = None
+        bestKey = None
+        for direction, (dx, dy) in self.deltas.items():
+            if (dx, dy) == back:
+                continue
+            cell = ((x + dx) % width, (y + dy) % height)
+            index = cell[1] * width + cell[0]
+            if occupancy[index]:
+                continue
+            if field is None:
+                key = (cell in risky, 0, 0)
+            elif field.distance[index] != UNKNOWN:
+                key = (cell in risky, 0, field.distance[index])
+            else:
+                tx, ty = target
+                ex = abs(tx - cell[0])
+                ey = abs(ty - cell[1])
+                key = (cell in risky, 1, min(ex, width - ex) + min(ey, height - ey))
+            key += (self.rng.random(),)  # break ties randomly
+            if bestKey is None or key < bestKey:
+                best, bestKey = direction, key
+        return best if best is not None else current
+
+
+class Wanderer:
+    # Walks a worm towards a random free cell near its head, picking a new one
+    # when it gets there, when the cell gets covered or after a while. Keeping
+    # the targets near keeps the searches small.
+
+    def __init__(
+        self, board, deltas, rng=None, retarget=50, radius=8, **pathfinderOptions
+    ):
+        self.rng = rng or random.Random()
+        pathfinderOptions.setdefault("maxAge", retarget)
+        self.pathfinder = Pathfinder(board, deltas, rng=self.rng, **pathfinderOptions)
+        self.retarget = retarget  # ticks before picking a new target
+        self.radius = radius  # how far away targets are picked
+        self.target = None
+        self.ticks = 0
+
+    def chooseDirection(self, worm, current=None, avoid=()):
+        board = self.pathfinder.board
+        target = self.target
+        if (
+            target is None
+            or self.ticks >= self.retarget
+            or worm.head() == target
+            or board.occupancy[target[1] * board.width + target[0]]
+        ):
+            target = self.target = self.nearbyFreeCell(worm.head())
+            self.ticks = 0
+        self.ticks += 1
+        return self.pathfinder.chooseDirection(worm, target, current, avoid)
+
+    def nearbyFreeCell(self, head):
+        board = self.pathfinder.board
+        rng = self.rng
+        radius = self.radius
+        x, y = head
+        for _ in range(8):
+            cell = (
+                (x + rng.randint(-radius, radius)) % board.width,
+                (y + rng.randint(-radius, radius)) % board.height,
+            )
+            if not board.occupancy[cell[1] * board.width + cell[0]]:
+                return cell
+        return board.randomFreeCell(rng)
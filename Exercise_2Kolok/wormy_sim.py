@@ -0,0 +1,158 @@
+# Headless batch simulator for Wormy.
+#
+# Runs many games of wormy.GameState without a window, each driven by a
+# policy, and reports score/length statistics and simulation throughput.
+# Useful for tuning the apple timers and the speed constants.
+#
+# A policy is any callable that takes the GameState and returns the
+# direction to turn to (UP, DOWN, LEFT or RIGHT), or None to keep going.
+#
+# Usage: python -m Exercise_2Kolok.wormy_sim --games 2000 --processes 4 --seed 1
+#        python -m Exercise_2Kolok.wormy_sim --policy autopilot
+#        python -m Exercise_2Kolok.wormy_sim --board 1000x1000 --worms 50 --games 10
+
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import random
+import statistics
+import time
+from multiprocessing import Pool
+
+from Exercise_2Kolok.wormy import (
+    CELLHEIGHT,
+    CELLWIDTH,
+    DIRECTIONDELTAS,
+    DOWN,
+    LEFT,
+    OPPOSITE,
+    RIGHT,
+    UP,
+    GameState,
+    parseBoardSize,
+)
+from Exercise_2Kolok.wormy_ai import Pathfinder
+
+MAX_TICKS = 100_000
+
+
+class RandomPolicy:
+    # Turns to a random direction every few ticks.
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def __call__(self, state):
+        if self.rng.random() < 0.2:
+            return self.rng.choice([UP, DOWN, LEFT, RIGHT])
+        return None
+
+
+class GreedyPolicy:
+    # Heads for the red apple along the shorter way round the board,
+    # avoiding cells its own body is on when it can.
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def __call__(self, state):
+        worm = state.player_worm
+        width, height = worm.width, worm.height
+        x, y = worm.head()
+        target = state.red_apple
+        wanted = []
+        if target is not None:
+            dx = (target[0] - x) % width
+            dy = (target[1] - y) % height
+            if dx:
+                wanted.append(RIGHT if dx <= width // 2 else LEFT)
+            if dy:
+                wanted.append(DOWN if dy <= height // 2 else UP)
+        others = [UP, DOWN, LEFT, RIGHT]
+        self.rng.shuffle(others)
+        for direction in wanted + others:
+            if direction == OPPOSITE[state.player_direction]:
+                continue
+            stepx, stepy = DIRECTIONDELTAS[direction]
+            if not worm.occupies(((x + stepx) % width, (y + stepy) % height)):
+                return direction
+        return None
+
+
+AUTOPILOT_SEARCH_NODES = 4096  # cells searched per tick by the autopilot
+
+
+class AutopilotPolicy:
+    # The in-game autopilot (wormy_ai.Pathfinder), with its search limited by
+    # nodes instead of time so results don't depend on the machine.
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.pathfinder = None
+
+    def __call__(self, state):
+        if self.pathfinder is None:
+            self.pathfinder = Pathfinder(
+                state.board,
+                DIRECTIONDELTAS,
+                budget=None,
+                maxNodes=AUTOPILOT_SEARCH_NODES,
+                rng=self.rng,
+            )
+        return self.pathfinder.chooseDirection(
+            state.player_worm,
+            state.red_apple,
+            state.player_direction,
+            avoid=state.otherHeads(),
+        )
+
+
+POLICIES = {"random": RandomPolicy, "greedy": GreedyPolicy, "autopilot": AutopilotPolicy}
+
+
+def runGame(seed, policyName, maxTicks=MAX_TICKS, board=(CELLWIDTH, CELLHEIGHT), worms=1):
+    state = GameState(random.Random(seed), board[0], board[1], worms)
+    policy = POLICIES[policyName](random.Random(seed + 1))
+    while state.ticks < maxTicks and state.step(policy(state)):
+        pass
+    return state.game_score, len(state.player_worm), state.ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless batch simulator for Wormy.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-ticks", type=int, default=MAX_TICKS)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="greedy")
+    parser.add_argument(
+        "--board", type=parseBoardSize, default=(CELLWIDTH, CELLHEIGHT), metavar="WxH"
+    )
+    parser.add_argument("--worms", type=int, default=1, help="number of purple worms")
+    args = parser.parse_args()
+
+    seeds = [args.seed + 2 * i for i in range(args.games)]
+    start = time.perf_counter()
+    with Pool(args.processes) as pool:
+        results = pool.starmap(
+            runGame,
+            [(seed, args.policy, args.max_ticks, args.board, args.worms) for seed in seeds],
+        )
+    elapsed = time.perf_counter() - start
+
+    scores = [score for score, _, _ in results]
+    lengths = [length for _, length, _ in results]
+    ticks = sum(tick for _, _, tick in results)
+    print(f"games:        {len(results)} in {elapsed:.2f}s "
+          f"({len(results) / elapsed * 60:.0f} games/min)")
+    print(f"ticks:        {ticks} ({ticks / elapsed:.0f} ticks/s, "
+          f"{ticks / elapsed * 60 / 1e6:.1f}M ticks/min)")
+    print(f"score:        mean {statistics.mean(scores):.2f}, max {max(scores)}")
+    print(f"length:       mean {statistics.mean(lengths):.2f}, max {max(lengths)}")
+    print(f"game length:  mean {ticks / len(results):.0f} ticks")
+
+
+if __name__ == "__main__":
+    main()
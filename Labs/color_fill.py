@@ -1,6 +1,9 @@
 import pygame
 import sys
 
+from common.hud import TextCache, get_font
+from Labs.color_fill_solver import HintEngine
+
 SCREEN_WIDTH = 600
 SCREEN_HEIGHT = 600
 GRID_SIZE = 5
@@ -15,19 +18,27 @@ COLORS = [
 BACKGROUND_COLOR = (30, 30, 30)
 TEXT_COLOR = (255, 255, 255)
 FONT_SIZE = 24
+# Window events after which the screen's contents may have been lost.
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED)
 
 
 # --- Helper Classes ---
 class Cell:
     """Represents a single cell in the grid."""
 
-    def __init__(self, x, y, size):
+    def __init__(self, x, y, size, row=0, col=0, grid=None):
         self.rect = pygame.Rect(x, y, size, size)
+        self.row = row
+        self.col = col
+        self.grid = grid  # notified of color changes to keep its counters current
         self.color_index = -1  # -1 means no color yet
 
     def set_color(self, color_index):
         """Set the color of the cell."""
+        old_color_index = self.color_index
         self.color_index = color_index
+        if self.grid is not None and old_color_index != color_index:
+            self.grid.on_color_changed(self, old_color_index)
 
     def draw(self, screen):
         """Draw the cell on the screen."""
@@ -44,6 +55,9 @@ class Grid:
         self.cell_size = cell_size
         self.padding = padding
         self.cells = self._initialize_cells()
+        self.neighbors = self._initialize_neighbors()
+        self._filled_count = 0
+        self._conflict_count = 0  # pairs of adjacent cells sharing a color
 
     def _initialize_cells(self):
         """Create a grid of cells."""
@@ -55,62 +69,100 @@ class Grid:
             for col in range(self.grid_size):
                 x = start_x + col * self.cell_size
                 y = start_y + row * self.cell_size
-                row_cells.append(Cell(x, y, self.cell_size))
+                row_cells.append(Cell(x, y, self.cell_size, row, col, self))
             cells.append(row_cells)
         return cells
 
+    def _initialize_neighbors(self):
+        """Precompute the orthogonal neighbors of every cell, indexed by row/col."""
+        neighbors = []
+        for row in range(self.grid_size):
+            row_neighbors = []
+            for col in range(self.grid_size):
+                adjacent = []
+                for d_row, d_col in ((-1, 0), (0, -1), (0, 1), (1, 0)):
+                    r, c = row + d_row, col + d_col
+                    if 0 <= r < self.grid_size and 0 <= c < self.grid_size:
+                        adjacent.append(self.cells[r][c])
+                row_neighbors.append(tuple(adjacent))
+            neighbors.append(row_neighbors)
+        return neighbors
+
     def draw(self, screen):
         """Draw the grid on the screen."""
         for row in self.cells:
             for cell in row:
                 cell.draw(screen)
 
+    def cell_at(self, row, col):
+        """Return the cell at the given row/col, or None if out of bounds."""
+        if 0 <= row < self.grid_size and 0 <= col < self.grid_size:
+            return self.cells[row][col]
+        return None
+
     def get_cell_at(self, pos):
         """Return the cell at a given mouse position."""
-        for row in self.cells:
-            for cell in row:
-                if cell.rect.collidepoint(pos):
-                    return cell
-        return None
+        x = pos[0] - self.padding
+        y = pos[1] - self.padding
+        if x < 0 or y < 0:
+            return None
+        return self.cell_at(y // self.cell_size, x // self.cell_size)
 
     def is_valid_color(self, cell, color_index):
         """Check if the color can be applied to the cell."""
-        neighbors = self.get_neighbors(cell)
-        for neighbor in neighbors:
+        for neighbor in self.neighbors[cell.row][cell.col]:
             if neighbor.color_index == color_index:
                 return False
         return True
 
     def get_neighbors(self, cell):
         """Get neighboring cells of a given cell."""
-        neighbors = []
-        for row in self.cells:
-            for c in row:
-                if (
-                    abs(c.rect.x - cell.rect.x) == self.cell_size
-                    and c.rect.y == cell.rect.y
-                ) or (
-                    abs(c.rect.y - cell.rect.y) == self.cell_size
-                    and c.rect.x == cell.rect.x
-                ):
-                    neighbors.append(c)
-        return neighbors
+        return list(self.neighbors[cell.row][cell.col])
 
     def get_valid_colors(self, cell):
         """Return a list of valid colors for the given cell."""
-        valid_colors = []
-        for i in range(len(COLORS)):
-            if self.is_valid_color(cell, i):
-                valid_colors.append(i)
-        return valid_colors
+        used = {neighbor.color_index for neighbor in self.neighbors[cell.row][cell.col]}
+        return [i for i in range(len(COLORS)) if i not in used]
+
+    def on_color_changed(self, cell, old_color_index):
+        """Update the filled-cell and conflict counters after a cell changed color."""
+        if old_color_index == -1:
+            self._filled_count += 1
+        elif cell.color_index == -1:
+            self._filled_count -= 1
+        for neighbor in self.neighbors[cell.row][cell.col]:
+            if old_color_index != -1 and neighbor.color_index == old_color_index:
+                self._conflict_count -= 1
+            if cell.color_index != -1 and neighbor.color_index == cell.color_index:
+                self._conflict_count += 1
+
+    @property
+    def cell_count(self):
+        """Total number of cells in the grid."""
+        return self.grid_size * self.grid_size
+
+    @property
+    def filled_count(self):
+        """Number of cells that have a color."""
+        return self._filled_count
+
+    @property
+    def empty_count(self):
+        """Number of cells that still need a color."""
+        return self.cell_count - self._filled_count
+
+    @property
+    def conflict_count(self):
+        """Number of pairs of neighboring cells that share a color."""
+        return self._conflict_count
 
     def is_complete(self):
         """Check if all cells have been filled."""
-        for row in self.cells:
-            for cell in row:
-                if cell.color_index == -1:
-                    return False
-        return True
+        return self._filled_count == self.cell_count
+
+    def is_solved(self):
+        """Check if all cells have been filled without any conflicts."""
+        return self.is_complete() and self._conflict_count == 0
 
 
 class ColorFillGame:
@@ -121,33 +173,60 @@ class ColorFillGame:
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption("Color Fill Puzzle - 211080")
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.Font(None, FONT_SIZE)
+        self.font = get_font(None, FONT_SIZE)
+        self.text_cache = TextCache(self.font)
         self.grid = Grid(GRID_SIZE, CELL_SIZE, PADDING)
         self.hovered_cell = None
         self.game_won = False
+        self.hint_engine = HintEngine(self.grid)
+        self.hint = None
 
         self.selected_color_index = 0
 
-    def draw_text(self, text, x, y, center=False):
-        """Render text on the screen."""
-        render = self.font.render(text, True, TEXT_COLOR)
+        # Retained-mode rendering: only regions marked dirty are redrawn.
+        self.swatch_rect = pygame.Rect(
+            SCREEN_WIDTH - PADDING - 50, SCREEN_HEIGHT - PADDING - 60, 50, 50
+        )
+        # One line of text, kept above the grid so clearing it never touches
+        # the first row of cells.
+        self.status_rect = pygame.Rect(
+            10, 30, SCREEN_WIDTH - 20, min(self.font.get_linesize(), PADDING - 30)
+        )
+        self.background = self.build_background()
+        self.dirty_cells = set()
+        self.swatch_dirty = False
+        self.status_dirty = False
+        self.full_redraw = True
+
+    def draw_text(self, text, x, y, center=False, surface=None):
+        """Render text on the screen (or on the given surface)."""
+        surface = surface or self.screen
+        render = self.text_cache.render(text, TEXT_COLOR)
         if center:
             rect = render.get_rect(center=(x, y))
-            self.screen.blit(render, rect)
+            surface.blit(render, rect)
         else:
-            self.screen.blit(render, (x, y))
-
-    def draw_selected_color(self):
-        """Draw the currently selected color and text in the bottom-right corner."""
-        x = SCREEN_WIDTH - PADDING - 50
-        y = SCREEN_HEIGHT - PADDING - 60
+            surface.blit(render, (x, y))
 
-        self.draw_text("Current Color:", x - 50, y - 30)
-        self.draw_text("Right-click to change", x - 90, y + 60)
+    def build_background(self):
+        """Pre-render the static parts of the screen: labels and empty cell borders."""
+        background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        background.fill(BACKGROUND_COLOR)
+        self.draw_text(
+            "Teodor Angeleski - Click to color the cells.", 10, 10, surface=background
+        )
+        x, y = self.swatch_rect.topleft
+        self.draw_text("Current Color:", x - 50, y - 30, surface=background)
+        self.draw_text("Right-click to change", x - 90, y + 60, surface=background)
+        for row in Grid(GRID_SIZE, CELL_SIZE, PADDING).cells:
+            for cell in row:
+                cell.draw(background)
+        return background
 
-        rect = pygame.Rect(x, y, 50, 50)
-        pygame.draw.rect(self.screen, COLORS[self.selected_color_index], rect)
-        pygame.draw.rect(self.screen, (200, 200, 200), rect, 2)  # Border
+    def draw_selected_color(self):
+        """Draw the currently selected color in the bottom-right corner."""
+        pygame.draw.rect(self.screen, COLORS[self.selected_color_index], self.swatch_rect)
+        pygame.draw.rect(self.screen, (200, 200, 200), self.swatch_rect, 2)  # Border
 
     def draw_hover_preview(self, cell):
         """Draw a hover preview of valid colors for the cell."""
@@ -166,10 +245,78 @@ class ColorFillGame:
             pygame.draw.rect(self.screen, (COLORS[color_index]), preview_rect)
             pygame.draw.rect(self.screen, (200, 200, 200), preview_rect, 1)  # Border
 
+    def draw_hint(self):
+        """Outline the hinted cell with the color the solver suggests."""
+        if not self.hint:
+            return
+        row, col, color_index = self.hint
+        cell = self.grid.cells[row][col]
+        pygame.draw.rect(self.screen, COLORS[color_index], cell.rect, 6)
+
+    def draw_status(self):
+        """Draw the hint instructions, or a warning if the board is stuck."""
+        self.screen.blit(self.background, self.status_rect, self.status_rect)
+        x, y = self.status_rect.topleft
+        if self.hint_engine.solvable:
+            self.draw_text("Press H for a hint.", x, y)
+        else:
+            self.draw_text("No solution left - the board can't be completed.", x, y)
+
+    def draw_cell(self, cell):
+        """Redraw a single cell together with its hover preview and hint outline."""
+        self.screen.blit(self.background, cell.rect, cell.rect)
+        cell.draw(self.screen)
+        if cell is self.hovered_cell:
+            self.draw_hover_preview(cell)
+        if self.hint and self.grid.cell_at(self.hint[0], self.hint[1]) is cell:
+            self.draw_hint()
+
+    def mark_cell_dirty(self, cell):
+        """Queue a cell to be redrawn on the next frame."""
+        if cell:
+            self.dirty_cells.add(cell)
+
+    def set_hint(self, hint):
+        """Replace the shown hint, marking the old and new hinted cells dirty."""
+        if self.hint:
+            self.mark_cell_dirty(self.grid.cell_at(self.hint[0], self.hint[1]))
+        self.hint = hint
+        if hint:
+            self.mark_cell_dirty(self.grid.cell_at(hint[0], hint[1]))
+
+    def render(self):
+        """Redraw only what changed since the last frame and push those regions."""
+        if self.full_redraw:
+            self.screen.blit(self.background, (0, 0))
+            for row in self.grid.cells:
+                for cell in row:
+                    self.draw_cell(cell)
+            self.draw_status()
+            self.draw_selected_color()
+            pygame.display.flip()
+        else:
+            rects = []
+            for cell in self.dirty_cells:
+                self.draw_cell(cell)
+                rects.append(cell.rect)
+            if self.status_dirty:
+                self.draw_status()
+                rects.append(self.status_rect)
+            if self.swatch_dirty:
+                self.draw_selected_color()
+                rects.append(self.swatch_rect)
+            if rects:
+                pygame.display.update(rects)
+        self.dirty_cells.clear()
+        self.swatch_dirty = False
+        self.status_dirty = False
+        self.full_redraw = False
+
     def check_win_condition(self):
         """Check if the player has won."""
         if self.grid.is_complete():
             self.game_won = True
+            self.full_redraw = True
 
     def draw_win_screen(self):
         """Draw the win screen with a play again button."""
@@ -189,17 +336,28 @@ class ColorFillGame:
         self.grid = Grid(GRID_SIZE, CELL_SIZE, PADDING)
         self.selected_color_index = 0
         self.game_won = False
+        self.hint_engine = HintEngine(self.grid)
+        self.hint = None
+        self.hovered_cell = None
+        self.dirty_cells.clear()
+        self.full_redraw = True
 
     def run(self):
         """Main game loop."""
         running = True
         while running:
             mouse_pos = pygame.mouse.get_pos()
-            self.hovered_cell = self.grid.get_cell_at(mouse_pos)
+            hovered_cell = self.grid.get_cell_at(mouse_pos)
+            if hovered_cell is not self.hovered_cell:
+                self.mark_cell_dirty(self.hovered_cell)
+                self.mark_cell_dirty(hovered_cell)
+                self.hovered_cell = hovered_cell
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
+                elif event.type in EXPOSE_EVENTS:
+                    self.full_redraw = True
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     if self.game_won:
                         play_again_rect = self.draw_win_screen()
@@ -209,19 +367,19 @@ class ColorFillGame:
                         self.handle_mouse_click(event.pos)
                     elif event.button == 3:  # Right click
                         self.cycle_selected_color()
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_h:
+                    self.set_hint(self.hint_engine.hint())
 
             if not self.game_won:
-                self.screen.fill(BACKGROUND_COLOR)
-                self.draw_text("Teodor Angeleski - Click to color the cells.", 10, 10)
-                self.grid.draw(self.screen)
-                if self.hovered_cell:
-                    self.draw_hover_preview(self.hovered_cell)
-                self.draw_selected_color()
                 self.check_win_condition()
-            else:
+
+            if not self.game_won:
+                self.render()
+            elif self.full_redraw:
                 self.draw_win_screen()
+                pygame.display.flip()
+                self.full_redraw = False
 
-            pygame.display.flip()
             self.clock.tick(60)
 
         pygame.quit()
@@ -233,10 +391,16 @@ class ColorFillGame:
         if cell:
             if self.grid.is_valid_color(cell, self.selected_color_index):
                 cell.set_color(self.selected_color_index)
+                self.mark_cell_dirty(cell)
+                was_solvable = self.hint_engine.solvable
+                if self.hint_engine.update(cell) != was_solvable:
+                    self.status_dirty = True
+                self.set_hint(None)
 
     def cycle_selected_color(self):
         """Cycle to the next color."""
         self.selected_color_index = (self.selected_color_index + 1) % len(COLORS)
+        self.swatch_dirty = True
 
 
 if __name__ == "__main__":
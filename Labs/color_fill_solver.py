@@ -0,0 +1,383 @@
+import heapq
+import random
+import sys
+import time
+from functools import lru_cache
+
+NUM_COLORS = 4  # matches len(COLORS) in color_fill.py
+
+
+# --- Helper Functions ---
+@lru_cache(maxsize=None)
+def _grid_neighbors(grid_size):
+    """Return the orthogonal neighbor indices of every cell of a square grid."""
+    neighbors = []
+    for row in range(grid_size):
+        for col in range(grid_size):
+            adjacent = []
+            if row > 0:
+                adjacent.append((row - 1) * grid_size + col)
+            if col > 0:
+                adjacent.append(row * grid_size + col - 1)
+            if col < grid_size - 1:
+                adjacent.append(row * grid_size + col + 1)
+            if row < grid_size - 1:
+                adjacent.append((row + 1) * grid_size + col)
+            neighbors.append(tuple(adjacent))
+    return tuple(neighbors)
+
+
+def _popcounts(num_colors):
+    """Return a table mapping every domain bitmask to its number of set bits."""
+    return [bin(mask).count("1") for mask in range(1 << num_colors)]
+
+
+def grid_state(grid):
+    """Return the row-major color indices and neighbor indices of a Grid."""
+    colors = [cell.color_index for row in grid.cells for cell in row]
+    return colors, _grid_neighbors(grid.grid_size)
+
+
+# --- Solver ---
+class ColorFillSolver:
+    """Backtracking solver for a partially colored board.
+
+    Uses bitmask domains, forward checking and DSatur ordering (most
+    constrained cell first, ties broken by degree). Independent regions of
+    empty cells are solved separately, so a dead end in one region never
+    causes the search to thrash through another.
+    """
+
+    def __init__(self, colors, neighbors, num_colors=NUM_COLORS):
+        self.colors = colors
+        self.neighbors = neighbors
+        self.num_colors = num_colors
+        self.full_mask = (1 << num_colors) - 1
+        self.popcount = _popcounts(num_colors)
+        self.nodes = 0  # number of assignments tried, for benchmarking
+
+    @classmethod
+    def from_grid(cls, grid, num_colors=NUM_COLORS):
+        """Create a solver for the current state of a Grid."""
+        colors, neighbors = grid_state(grid)
+        return cls(colors, neighbors, num_colors)
+
+    def has_conflict(self):
+        """Check if two adjacent colored cells already share a color."""
+        colors = self.colors
+        for index, color in enumerate(colors):
+            if color == -1:
+                continue
+            for neighbor in self.neighbors[index]:
+                if colors[neighbor] == color:
+                    return True
+        return False
+
+    def domain(self, index):
+        """Return the bitmask of colors still allowed for an empty cell."""
+        mask = self.full_mask
+        for neighbor in self.neighbors[index]:
+            color = self.colors[neighbor]
+            if color != -1:
+                mask &= ~(1 << color)
+        return mask
+
+    def regions(self, seeds=None):
+        """Return the connected regions of empty cells (optionally only those touching seeds)."""
+        colors = self.colors
+        neighbors = self.neighbors
+        seen = set()
+        regions = []
+        if seeds is None:
+            seeds = range(len(colors))
+        for start in seeds:
+            if colors[start] != -1 or start in seen:
+                continue
+            seen.add(start)
+            region = [start]
+            for index in region:  # the list grows while we walk it (BFS)
+                for neighbor in neighbors[index]:
+                    if colors[neighbor] == -1 and neighbor not in seen:
+                        seen.add(neighbor)
+                        region.append(neighbor)
+            regions.append(region)
+        return regions
+
+    def solve_region(self, region, limit=1):
+        """Search one region of empty cells.
+
+        Returns (count, solution) where count is the number of solutions found
+        (stopping at limit) and solution maps cell index -> color for the first
+        one, or None.
+        """
+        colors = self.colors
+        neighbors = self.neighbors
+        popcount = self.popcount
+
+        work = {}  # cell index -> assigned color, -1 while unassigned
+        domain = {}
+        degrees = {}  # negated, so the heap prefers high-degree cells on ties
+        for index in region:
+            mask = self.domain(index)
+            if not mask:
+                return 0, None
+            work[index] = -1
+            domain[index] = mask
+            degrees[index] = -sum(1 for n in neighbors[index] if colors[n] == -1)
+        heap = [(popcount[domain[i]], degrees[i], i) for i in region]
+        heapq.heapify(heap)
+
+        def select():
+            while heap:
+                size, _, index = heapq.heappop(heap)
+                if work[index] == -1 and popcount[domain[index]] == size:
+                    return index
+            return None
+
+        trail = []  # (cell index, previous domain) for undoing forward checks
+        count = 0
+        solution = None
+        var = select()
+        if var is None:
+            return 1, {}
+        stack = [[var, domain[var], 0]]
+        while stack:
+            frame = stack[-1]
+            var, remaining, mark = frame
+
+            # undo the previous value tried for this cell
+            while len(trail) > mark:
+                index, mask = trail.pop()
+                domain[index] = mask
+                heapq.heappush(heap, (popcount[mask], degrees[index], index))
+            work[var] = -1
+
+            if not remaining:
+                stack.pop()
+                heapq.heappush(heap, (popcount[domain[var]], degrees[var], var))
+                continue
+
+            bit = remaining & -remaining
+            frame[1] = remaining ^ bit
+            work[var] = bit.bit_length() - 1
+            self.nodes += 1
+
+            # forward checking: remove the color from empty neighbors
+            consistent = True
+            for neighbor in neighbors[var]:
+                if work.get(neighbor, 0) == -1 and domain[neighbor] & bit:
+                    mask = domain[neighbor]
+                    trail.append((neighbor, mask))
+                    mask ^= bit
+                    domain[neighbor] = mask
+                    if not mask:
+                        consistent = False
+                        break
+                    heapq.heappush(heap, (popcount[mask], degrees[neighbor], neighbor))
+            if not consistent:
+                continue
+
+            next_var = select()
+            if next_var is None:
+                count += 1
+                if solution is None:
+                    solution = dict(work)
+                if count >= limit:
+                    break
+                continue
+            stack.append([next_var, domain[next_var], len(trail)])
+        return count, solution
+
+    def solve(self):
+        """Return a full row-major coloring of the board, or None if unsolvable."""
+        if self.has_conflict():
+            return None
+        result = list(self.colors)
+        for region in self.regions():
+            count, solution = self.solve_region(region)
+            if not count:
+                return None
+            for index, color in solution.items():
+                result[index] = color
+        return result
+
+    def count_solutions(self, limit=1000):
+        """Count the completions of the board, stopping once limit is reached."""
+        if self.has_conflict():
+            return 0
+        total = 1
+        for region in self.regions():
+            count, _ = self.solve_region(region, limit=limit)
+            if not count:
+                return 0
+            total = min(total * count, limit)
+        return total
+
+
+# --- Public API ---
+def is_solvable(grid, num_colors=NUM_COLORS):
+    """Check if the board can still be completed."""
+    return ColorFillSolver.from_grid(grid, num_colors).solve() is not None
+
+
+def count_solutions(grid, limit=1000, num_colors=NUM_COLORS):
+    """Count the completions of the board, up to limit."""
+    return ColorFillSolver.from_grid(grid, num_colors).count_solutions(limit)
+
+
+def get_hint(grid, num_colors=NUM_COLORS):
+    """Return (row, col, color_index) for a safe move, or None if there is none."""
+    return HintEngine(grid, num_colors).hint()
+
+
+class HintEngine:
+    """Keeps a solution of the board up to date as the player colors cells.
+
+    When a move disagrees with the cached solution, only a small window of
+    empty cells around it is re-solved with the rest of the solution held
+    fixed. The window doubles until the repair succeeds or covers the whole
+    board, at which point the answer is exact.
+    """
+
+    def __init__(self, grid, num_colors=NUM_COLORS):
+        self.grid = grid
+        self.num_colors = num_colors
+        self.solution = ColorFillSolver.from_grid(grid, num_colors).solve()
+
+    @property
+    def solvable(self):
+        """Whether the board can still be completed."""
+        return self.solution is not None
+
+    def update(self, cell):
+        """Refresh the cached solution after a cell has been colored."""
+        # Coloring cells only adds constraints, so a stuck board stays stuck.
+        if self.solution is None:
+            return False
+        grid_size = self.grid.grid_size
+        index = cell.row * grid_size + cell.col
+        if self.solution[index] == cell.color_index:
+            return True
+
+        if self.grid.conflict_count:
+            self.solution = None
+            return False
+        colors, neighbors = grid_state(self.grid)
+        self.solution[index] = cell.color_index
+
+        radius = 2
+        while True:
+            window = [
+                r * grid_size + c
+                for r in range(max(cell.row - radius, 0), min(cell.row + radius + 1, grid_size))
+                for c in range(max(cell.col - radius, 0), min(cell.col + radius + 1, grid_size))
+                if colors[r * grid_size + c] == -1
+            ]
+            view = list(self.solution)
+            for i in window:
+                view[i] = -1
+            solver = ColorFillSolver(view, neighbors, self.num_colors)
+            repaired = {}
+            for region in solver.regions(window):
+                count, solution = solver.solve_region(region)
+                if not count:
+                    break
+                repaired.update(solution)
+            else:
+                for i, color in repaired.items():
+                    self.solution[i] = color
+                return True
+            if radius >= grid_size:
+                self.solution = None
+                return False
+            radius *= 2
+
+    def hint(self):
+        """Return (row, col, color_index) for the most constrained empty cell."""
+        if self.solution is None:
+            return None
+        solver = ColorFillSolver.from_grid(self.grid, self.num_colors)
+        best = None
+        best_size = self.num_colors + 1
+        for index, color in enumerate(solver.colors):
+            if color != -1:
+                continue
+            size = solver.popcount[solver.domain(index)]
+            if size < best_size:
+                best, best_size = index, size
+                if size == 1:
+                    break
+        if best is None:
+            return None
+        row, col = divmod(best, self.grid.grid_size)
+        return row, col, self.solution[best]
+
+
+# --- Benchmark ---
+def naive_solve(colors, neighbors, num_colors=NUM_COLORS, max_nodes=2_000_000):
+    """Plain chronological backtracking without propagation, for comparison.
+
+    Returns (solution, nodes); solution is None if the board is unsolvable or
+    max_nodes assignments were tried without finishing.
+    """
+    colors = list(colors)
+    empty = [i for i, color in enumerate(colors) if color == -1]
+    nodes = 0
+    position = 0
+    while 0 <= position < len(empty) and nodes < max_nodes:
+        index = empty[position]
+        color = colors[index] + 1
+        while color < num_colors and any(colors[n] == color for n in neighbors[index]):
+            color += 1
+        if color < num_colors:
+            nodes += 1
+            colors[index] = color
+            position += 1
+        else:
+            colors[index] = -1
+            position -= 1
+    return (colors if position == len(empty) else None), nodes
+
+
+def _random_board(grid_size, fill, rng, num_colors=NUM_COLORS):
+    """Return a board with a fraction of cells colored by random valid moves."""
+    neighbors = _grid_neighbors(grid_size)
+    colors = [-1] * (grid_size * grid_size)
+    cells = list(range(len(colors)))
+    rng.shuffle(cells)
+    for index in cells[: int(len(cells) * fill)]:
+        used = {colors[n] for n in neighbors[index]}
+        choices = [c for c in range(num_colors) if c not in used]
+        if choices:
+            colors[index] = rng.choice(choices)
+    return colors, neighbors
+
+
+def benchmark(sizes=(5, 20, 50, 100), fills=(0.0, 0.3, 0.6), seed=211080):
+    """Compare the solver against naive backtracking on random partial boards."""
+    rng = random.Random(seed)
+    print(f"{'size':>5} {'fill':>5} {'solvable':>9} {'solver ms':>10} {'nodes':>7} {'naive ms':>10} {'nodes':>8}")
+    for grid_size in sizes:
+        for fill in fills:
+            colors, neighbors = _random_board(grid_size, fill, rng)
+
+            solver = ColorFillSolver(colors, neighbors)
+            start = time.perf_counter()
+            solvable = solver.solve() is not None
+            solver_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            _, naive_nodes = naive_solve(colors, neighbors)
+            naive_ms = (time.perf_counter() - start) * 1000
+            print(
+                f"{grid_size:>5} {fill:>5.1f} {str(solvable):>9} {solver_ms:>10.2f} "
+                f"{solver.nodes:>7} {naive_ms:>10.2f} {naive_nodes:>8}"
+            )
+
+
+if __name__ == "__main__":
+    # usage: python -m Labs.color_fill_solver [grid sizes...]
+    if len(sys.argv) > 1:
+        benchmark(sizes=tuple(int(arg) for arg in sys.argv[1:]))
+    else:
+        benchmark()
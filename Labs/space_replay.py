@@ -0,0 +1,94 @@
+# Headless replay of recorded Space Scavenger games.
+#
+# Re-simulates a game saved with `python -m Labs.space_scavenger --record
+# PATH` as fast as the CPU allows, checks that it ends with the recorded
+# score and level, and reports the slowest steps. Selected steps can be rendered to PNG files
+# to see what was on screen at that moment.
+#
+# Usage: python -m Labs.space_replay game.ssr
+#        python -m Labs.space_replay game.ssr --frames 600 1200 --out frames
+#        python -m Labs.space_replay game.ssr --every 60 --out frames
+
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import heapq
+import random
+import sys
+import time
+
+import pygame
+
+from Labs import space_scavenger
+from Labs.space_scavenger import FRAME_TIME, HEIGHT, WIDTH, InputLog, World
+
+SLOWEST_STEPS = 10
+
+
+def replay(log, frames=(), every=0, out_dir="."):
+    # Returns the final world, the total simulation time and the slowest
+    # (seconds, step) pairs. Rendering time is not counted.
+    world = World(random.Random(log.seed))
+    frames = set(frames)
+    screen = None
+    if frames or every:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.display.init()
+        pygame.font.init()
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        space_scavenger.load_assets(audio=False)
+        os.makedirs(out_dir, exist_ok=True)
+
+    slowest = []
+    elapsed = 0.0
+    for controls in log:
+        start = time.perf_counter()
+        alive = world.step(controls)
+        seconds = time.perf_counter() - start
+        elapsed += seconds
+        if len(slowest) < SLOWEST_STEPS:
+            heapq.heappush(slowest, (seconds, world.steps))
+        elif seconds > slowest[0][0]:
+            heapq.heapreplace(slowest, (seconds, world.steps))
+
+        if screen is not None and (world.steps in frames or every and world.steps % every == 0):
+            space_scavenger.draw_frame(screen, world)
+            pygame.image.save(screen, os.path.join(out_dir, f"step_{world.steps:06d}.png"))
+        if not alive:
+            break
+    if screen is not None:
+        pygame.quit()
+    return world, elapsed, sorted(slowest, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded Space Scavenger game.")
+    parser.add_argument("replay", help="file written by space_scavenger.py --record")
+    parser.add_argument("--frames", type=int, nargs="*", default=[], help="steps to render")
+    parser.add_argument("--every", type=int, default=0, help="render every N-th step")
+    parser.add_argument("--out", default="replay_frames", help="directory for rendered steps")
+    args = parser.parse_args()
+
+    log = InputLog.load(args.replay)
+    world, elapsed, slowest = replay(log, args.frames, args.every, args.out)
+
+    game_seconds = world.steps * FRAME_TIME / 1000
+    print(f"seed:         {log.seed}")
+    print(f"steps:        {world.steps} of {log.steps} recorded ({game_seconds:.1f}s of game time)")
+    print(f"sim time:     {elapsed:.3f}s ({world.steps / max(elapsed, 1e-9):.0f} steps/s, "
+          f"{game_seconds / max(elapsed, 1e-9):.0f}x real time)")
+    print(f"result:       score {world.score}, level {world.level} "
+          f"(recorded score {log.score}, level {log.level})")
+    print("slowest steps:")
+    for seconds, step in slowest:
+        print(f"  step {step:>7}  {seconds * 1000:.3f} ms")
+
+    if (world.steps, world.score, world.level) != (log.steps, log.score, log.level):
+        print("replay diverged from the recording", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
 import pygame
+import numpy as np
+import argparse
 import random
 import os
+import struct
+import time
+from collections import namedtuple
 
-pygame.init()
+from common.hud import Label, get_font
+from common.spatial_hash import SpatialHash
+from common.sprite_cache import SpriteCache
 
 # Constants
 WIDTH, HEIGHT = 800, 600
@@ -15,6 +22,23 @@ RED = (255, 0, 0)
 GREEN = (0, 255, 0)
 BLUE = (0, 0, 255)
 
+SPACESHIP_SIZE = 50
+ASTEROID_SIZE = 50
+CRYSTAL_SIZE = 30
+POWER_UP_SIZE = 30
+BOOSTED_SPEED = 10
+POWER_UP_DURATION = 5000  # milliseconds
+FRAME_TIME = 1000 / FPS  # milliseconds of game time per update
+MAX_RENDER_FPS = 144  # 0 renders as fast as possible
+MAX_STEPS_PER_FRAME = 5  # beyond this the game slows down instead of freezing
+
+# Asteroid sprites are cached per (size, angle), rounded to these steps.
+ASTEROID_SIZE_STEP = 2  # pixels
+ASTEROID_ANGLE_STEP = 5  # degrees
+ASTEROID_SPRITE_CACHE_SIZE = 512
+COLLISION_CELL_SIZE = 64  # pixels per spatial hash cell
+STAR_COUNT = 100
+
 # Asset paths
 ASSETS_DIR = "Labs/assets"
 SPACESHIP_IMG = os.path.join(ASSETS_DIR, "spaceship.png")
@@ -23,252 +47,650 @@ CRYSTAL_IMG = os.path.join(ASSETS_DIR, "energy_crystal.png")
 BACKGROUND_MUSIC = os.path.join(ASSETS_DIR, "background_music.wav")
 CLASH_SOUND = os.path.join(ASSETS_DIR, "clash_sound.wav")
 
-# Initialize screen and assets
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Space Scavenger")
-
-spaceship_image = pygame.image.load(SPACESHIP_IMG)
-asteroid_image = pygame.image.load(ASTEROID_IMG)
-crystal_image = pygame.image.load(CRYSTAL_IMG)
-background_music = pygame.mixer.Sound(BACKGROUND_MUSIC)
-clash_sound = pygame.mixer.Sound(CLASH_SOUND)
-
-spaceship_image = pygame.transform.scale(spaceship_image, (50, 50))
-asteroid_image = pygame.transform.scale(asteroid_image, (50, 50))
-crystal_image = pygame.transform.scale(crystal_image, (30, 30))
+# Images and sounds are loaded by load_assets(), so the game logic below can
+# run without a window or audio device (see World and space_sim.py).
+spaceship_image = None
+asteroid_image = None
+crystal_image = None
+background_music = None
+clash_sound = None
+asteroid_sprites = None
+hud_labels = None
+stats_label = None
+
+# The state of the movement keys for one update.
+Controls = namedtuple("Controls", ["left", "right", "up", "down"])
+NO_CONTROLS = Controls(False, False, False, False)
+# Controls packed as 4 bits (left = 1, right = 2, up = 4, down = 8) and back.
+CONTROL_STATES = [Controls(*(bool(bits >> i & 1) for i in range(4))) for bits in range(16)]
+
+# Replay files: a header, then (controls byte, varint step count) runs.
+REPLAY_MAGIC = b"SSRP"
+REPLAY_VERSION = 1
+REPLAY_HEADER = struct.Struct("<4sBQIII")  # magic, version, seed, steps, score, level
+
+
+def load_assets(audio=True):
+    global spaceship_image, asteroid_image, crystal_image, background_music, clash_sound
+    global asteroid_sprites, hud_labels, stats_label
+    spaceship_image = pygame.image.load(SPACESHIP_IMG).convert_alpha()
+    asteroid_image = pygame.image.load(ASTEROID_IMG).convert_alpha()
+    crystal_image = pygame.image.load(CRYSTAL_IMG).convert_alpha()
+    if audio:
+        background_music = pygame.mixer.Sound(BACKGROUND_MUSIC)
+        clash_sound = pygame.mixer.Sound(CLASH_SOUND)
+
+    spaceship_image = pygame.transform.scale(
+        spaceship_image, (SPACESHIP_SIZE, SPACESHIP_SIZE)
+    )
+    asteroid_image = pygame.transform.scale(asteroid_image, (ASTEROID_SIZE, ASTEROID_SIZE))
+    crystal_image = pygame.transform.scale(crystal_image, (CRYSTAL_SIZE, CRYSTAL_SIZE))
+    asteroid_sprites = SpriteCache(make_asteroid_sprite, ASTEROID_SPRITE_CACHE_SIZE)
+
+    font = get_font(None, 36)
+    hud_labels = (
+        Label(font, "Score: {}", WHITE),
+        Label(font, "Lives: {}", WHITE),
+        Label(font, "Level: {}", WHITE),
+    )
+    stats_label = Label(get_font(None, 24), "{}", WHITE, SPACE_BLUE)
+
+
+def make_asteroid_sprite(key):
+    size, angle = key
+    return pygame.transform.rotate(
+        pygame.transform.scale(asteroid_image, (size, size)), angle
+    ).convert_alpha()
+
+
+def add_entity(entities, entity):
+    # Entities remember their list index so they can be swap-removed in O(1).
+    entity.index = len(entities)
+    entities.append(entity)
+
+
+def remove_entity(entities, entity):
+    last = entities.pop()
+    if last is not entity:
+        entities[entity.index] = last
+        last.index = entity.index
+
+
+def pack_controls(controls):
+    return controls.left | controls.right << 1 | controls.up << 2 | controls.down << 3
+
+
+def keyboard_controls():
+    keys = pygame.key.get_pressed()
+    return Controls(
+        left=keys[pygame.K_LEFT] or keys[pygame.K_a],
+        right=keys[pygame.K_RIGHT] or keys[pygame.K_d],
+        up=keys[pygame.K_UP] or keys[pygame.K_w],
+        down=keys[pygame.K_DOWN] or keys[pygame.K_s],
+    )
 
 
 class Spaceship:
     def __init__(self):
-        self.image = spaceship_image
-        self.rect = self.image.get_rect(center=(WIDTH // 2, HEIGHT // 2))
+        self.rect = pygame.Rect(0, 0, SPACESHIP_SIZE, SPACESHIP_SIZE)
+        self.rect.center = (WIDTH // 2, HEIGHT // 2)
         self.lives = 3
         self.speed = SPACESHIP_SPEED
+        self.speed_timer = 0
         self.shield = False
         self.shield_timer = 0
+        self.prev_center = self.rect.center  # before the last move, for drawing
 
-    def draw(self, surface):
-        surface.blit(self.image, self.rect)
+    def draw(self, surface, alpha=1.0):
+        # alpha blends between the previous and the current position.
+        (px, py), (x, y) = self.prev_center, self.rect.center
+        center = (round(px + (x - px) * alpha), round(py + (y - py) * alpha))
+        surface.blit(spaceship_image, spaceship_image.get_rect(center=center))
         if self.shield:
-            pygame.draw.circle(surface, BLUE, self.rect.center, 35, 2)
+            pygame.draw.circle(surface, BLUE, center, 35, 2)
 
-    def move(self, keys):
-        if (keys[pygame.K_LEFT] or keys[pygame.K_a]) and self.rect.left > 0:
+    def move(self, controls):
+        self.prev_center = self.rect.center
+        if controls.left and self.rect.left > 0:
             self.rect.x -= self.speed
-        if (keys[pygame.K_RIGHT] or keys[pygame.K_d]) and self.rect.right < WIDTH:
+        if controls.right and self.rect.right < WIDTH:
             self.rect.x += self.speed
-        if (keys[pygame.K_UP] or keys[pygame.K_w]) and self.rect.top > 0:
+        if controls.up and self.rect.top > 0:
             self.rect.y -= self.speed
-        if (keys[pygame.K_DOWN] or keys[pygame.K_s]) and self.rect.bottom < HEIGHT:
+        if controls.down and self.rect.bottom < HEIGHT:
             self.rect.y += self.speed
 
-    def update_shield(self):
-        if self.shield and pygame.time.get_ticks() > self.shield_timer:
+    def update_timers(self, now):
+        if self.shield and now > self.shield_timer:
             self.break_shield()
+        if self.speed != SPACESHIP_SPEED and now >= self.speed_timer:
+            self.speed = SPACESHIP_SPEED
 
     def break_shield(self):
         self.shield = False
 
 
-class Asteroid:
-    def __init__(self):
-        edge = random.choice(["top", "bottom", "left", "right"])
+class AsteroidField:
+    # Structure-of-arrays asteroid store: one NumPy array per attribute, with
+    # the live asteroids packed at the front. Movement, growth, off-screen
+    # culling and collision tests run as whole-array operations.
+
+    FIELDS = ("x", "y", "prev_x", "prev_y", "dx", "dy", "scale", "angle")
+
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.x = np.empty(capacity)  # center
+        self.y = np.empty(capacity)
+        self.prev_x = np.empty(capacity)  # center before the last update
+        self.prev_y = np.empty(capacity)
+        self.dx = np.empty(capacity)  # unit direction
+        self.dy = np.empty(capacity)
+        self.scale = np.empty(capacity)
+        self.angle = np.empty(capacity, dtype=np.int32)  # sprite rotation, quantized
+
+    def __len__(self):
+        return self.count
+
+    def reserve(self, extra):
+        capacity = len(self.x)
+        if self.count + extra <= capacity:
+            return
+        capacity = max(capacity * 2, self.count + extra)
+        for name in self.FIELDS:
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[: self.count] = old[: self.count]
+            setattr(self, name, new)
+
+    def spawn(self, rng=random):
+        edge = rng.choice(["top", "bottom", "left", "right"])
         if edge == "top":
-            self.rect = asteroid_image.get_rect(center=(random.randint(0, WIDTH), 0))
+            x, y = rng.randint(0, WIDTH), 0
         elif edge == "bottom":
-            self.rect = asteroid_image.get_rect(
-                center=(random.randint(0, WIDTH), HEIGHT)
-            )
+            x, y = rng.randint(0, WIDTH), HEIGHT
         elif edge == "left":
-            self.rect = asteroid_image.get_rect(center=(0, random.randint(0, HEIGHT)))
+            x, y = 0, rng.randint(0, HEIGHT)
         else:  # right
-            self.rect = asteroid_image.get_rect(
-                center=(WIDTH, random.randint(0, HEIGHT))
-            )
-
-        self.scale_factor = 1.0
-        self.rotation_angle = random.randint(0, 360)
-        self.original_image = asteroid_image
-
-        self.image = pygame.transform.rotate(self.original_image, self.rotation_angle)
-        target_x = random.randint(0, WIDTH)
-        target_y = random.randint(0, HEIGHT)
-        self.direction = pygame.math.Vector2(
-            target_x - self.rect.centerx, target_y - self.rect.centery
+            x, y = WIDTH, rng.randint(0, HEIGHT)
+
+        target_x = rng.randint(0, WIDTH)
+        target_y = rng.randint(0, HEIGHT)
+        direction = pygame.math.Vector2(target_x - x, target_y - y)
+        if direction.length() > 0:
+            direction = direction.normalize()
+        angle = -direction.angle_to(pygame.math.Vector2(1, 0)) + 180
+
+        self.reserve(1)
+        i = self.count
+        self.x[i] = self.prev_x[i] = x
+        self.y[i] = self.prev_y[i] = y
+        self.dx[i] = direction.x
+        self.dy[i] = direction.y
+        self.scale[i] = 1.0
+        self.angle[i] = round(angle / ASTEROID_ANGLE_STEP) * ASTEROID_ANGLE_STEP % 360
+        self.count += 1
+
+    def sizes(self):
+        return (ASTEROID_SIZE * self.scale[: self.count]).astype(np.int32)
+
+    def keep(self, mask):
+        # Compact the arrays down to the asteroids where mask is True.
+        n = self.count
+        kept = int(np.count_nonzero(mask))
+        for name in self.FIELDS:
+            array = getattr(self, name)
+            array[:kept] = array[:n][mask]
+        self.count = kept
+
+    def remove(self, indices):
+        mask = np.ones(self.count, dtype=bool)
+        mask[indices] = False
+        self.keep(mask)
+
+    def update(self, speed):
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        self.prev_x[:n] = x
+        self.prev_y[:n] = y
+        x += self.dx[:n] * speed
+        y += self.dy[:n] * speed
+        self.scale[:n] += 0.002
+
+        half = self.sizes() / 2
+        off_screen = (x + half < 0) | (x - half > WIDTH) | (y + half < 0) | (y - half > HEIGHT)
+        if off_screen.any():
+            self.keep(~off_screen)
+
+    def colliding(self, rect):
+        # Indices of the asteroids whose bounding box overlaps rect.
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        half = self.sizes() / 2
+        hits = (
+            (x - half < rect.right)
+            & (x + half > rect.left)
+            & (y - half < rect.bottom)
+            & (y + half > rect.top)
         )
-        if self.direction.length() > 0:
-            self.direction = self.direction.normalize()
+        return np.flatnonzero(hits)
+
+    def draw(self, surface, alpha=1.0):
+        n = self.count
+        if not n:
+            return
+        sizes = (self.sizes() // ASTEROID_SIZE_STEP * ASTEROID_SIZE_STEP).tolist()
+        prev_x, prev_y = self.prev_x[:n], self.prev_y[:n]
+        xs = (prev_x + (self.x[:n] - prev_x) * alpha).astype(np.int32).tolist()
+        ys = (prev_y + (self.y[:n] - prev_y) * alpha).astype(np.int32).tolist()
+        blits = []
+        for size, angle, x, y in zip(sizes, self.angle[:n].tolist(), xs, ys):
+            image = asteroid_sprites.get((size, angle))
+            width, height = image.get_size()
+            blits.append((image, (x - width // 2, y - height // 2)))
+        surface.blits(blits, doreturn=False)
+
+
+class Starfield:
+    # Star positions as NumPy arrays, scrolled down one pixel per update and
+    # drawn straight into the surface's pixel array.
+
+    def __init__(self, count, np_rng):
+        self.np_rng = np_rng
+        self.x = np_rng.integers(0, WIDTH, count, endpoint=True)
+        self.y = np_rng.integers(0, HEIGHT, count, endpoint=True)
+
+    def __len__(self):
+        return len(self.x)
 
     def update(self):
-        self.rect.x += self.direction.x * ASTEROID_SPEED
-        self.rect.y += self.direction.y * ASTEROID_SPEED
-
-        self.scale_factor += 0.002
-        scaled_size = int(50 * self.scale_factor)
-        self.image = pygame.transform.scale(
-            self.original_image, (scaled_size, scaled_size)
-        )
-        self.rect = self.image.get_rect(center=self.rect.center)
-
-    def draw(self, surface):
-        angle = -self.direction.angle_to(pygame.math.Vector2(1, 0)) + 180
-        rotated_image = pygame.transform.rotate(self.image, angle)
-        new_rect = rotated_image.get_rect(center=self.rect.center)
-        surface.blit(rotated_image, new_rect)
-
-    def is_off_screen(self):
-        return (
-            self.rect.right < 0
-            or self.rect.left > WIDTH
-            or self.rect.bottom < 0
-            or self.rect.top > HEIGHT
-        )
+        self.y += 1
+        wrapped = self.y > HEIGHT
+        count = int(np.count_nonzero(wrapped))
+        if count:
+            self.y[wrapped] = 0
+            self.x[wrapped] = self.np_rng.integers(0, WIDTH, count, endpoint=True)
+
+    def draw(self, surface, alpha=1.0):
+        # Every star moved down one pixel in the last update, so it is drawn
+        # alpha of the way there; freshly wrapped stars start just above the top.
+        y = self.y if alpha >= 0.5 else self.y - 1
+        visible = (self.x < WIDTH) & (y >= 0) & (y < HEIGHT)
+        pixels = pygame.surfarray.pixels2d(surface)
+        pixels[self.x[visible], y[visible]] = surface.map_rgb(WHITE)
+        del pixels  # unlock the surface
 
 
 class Crystal:
-    def __init__(self):
-        self.image = crystal_image
-        self.rect = self.image.get_rect(
-            center=(random.randint(50, WIDTH - 50), random.randint(50, HEIGHT - 50))
-        )
+    def __init__(self, rng=random):
+        self.rect = pygame.Rect(0, 0, CRYSTAL_SIZE, CRYSTAL_SIZE)
+        self.rect.center = (rng.randint(50, WIDTH - 50), rng.randint(50, HEIGHT - 50))
 
     def draw(self, surface):
-        surface.blit(self.image, self.rect)
+        surface.blit(crystal_image, self.rect)
 
 
 class PowerUp:
-    def __init__(self, power_type):
+    def __init__(self, power_type, rng=random):
         self.type = power_type
-        self.image = pygame.Surface((30, 30), pygame.SRCALPHA)
         self.color = GREEN if self.type == "speed" else BLUE
-        pygame.draw.circle(self.image, self.color, (15, 15), 15)
-        self.rect = self.image.get_rect(
-            center=(random.randint(50, WIDTH - 50), random.randint(50, HEIGHT - 50))
-        )
+        self.rect = pygame.Rect(0, 0, POWER_UP_SIZE, POWER_UP_SIZE)
+        self.rect.center = (rng.randint(50, WIDTH - 50), rng.randint(50, HEIGHT - 50))
 
     def draw(self, surface):
-        surface.blit(self.image, self.rect)
+        pygame.draw.circle(surface, self.color, self.rect.center, POWER_UP_SIZE // 2)
+
+
+class World:
+    # All the game state, stepped one frame at a time. It never touches the
+    # display, the mixer or the pygame clock: randomness comes from rng, time
+    # from the number of steps and input from the controls passed to step(),
+    # so games can be simulated headlessly at full CPU speed.
+
+    def __init__(self, rng=None, star_count=STAR_COUNT):
+        self.rng = rng or random.Random()
+        self.np_rng = np.random.default_rng(self.rng.getrandbits(64))
+        self.now = 0  # game time in milliseconds
+        self.steps = 0
+        self.spaceship = Spaceship()
+        self.asteroids = AsteroidField()
+        self.crystals = []
+        self.power_ups = []
+        # Broad phase for spaceship pickups; asteroids are tested as arrays.
+        self.pickup_hash = SpatialHash(COLLISION_CELL_SIZE)
+        for _ in range(5):
+            self.add_pickup(self.crystals, Crystal(self.rng))
+        self.score = 0
+        self.level = 1
+        self.asteroid_speed = ASTEROID_SPEED
+        self.stars = Starfield(star_count, self.np_rng)
+        self.events = []  # what happened during the last step, e.g. "clash"
+
+    def spawn_asteroids(self, count):
+        for _ in range(count):
+            self.asteroids.spawn(self.rng)
+
+    def add_pickup(self, pickups, pickup):
+        add_entity(pickups, pickup)
+        self.pickup_hash.insert(pickup, pickup.rect)
+
+    def remove_pickup(self, pickups, pickup):
+        remove_entity(pickups, pickup)
+        self.pickup_hash.remove(pickup)
+
+    def step(self, controls):
+        # Advance the game by one frame. Returns False once the game is over.
+        rng = self.rng
+        spaceship = self.spaceship
+        self.events.clear()
+        self.steps += 1
+        self.now = int(self.steps * FRAME_TIME)
+
+        self.stars.update()
+        spaceship.move(controls)
+
+        if rng.randint(1, max(50 - self.level * 2, 10)) == 1:
+            self.asteroids.spawn(rng)
+
+        if rng.randint(1, 500) == 1:
+            self.add_pickup(self.power_ups, PowerUp(rng.choice(["speed", "shield"]), rng))
+
+        self.asteroids.update(self.asteroid_speed)
+
+        hits = self.asteroids.colliding(spaceship.rect)
+        if len(hits):
+            self.asteroids.remove(hits)
+        for _ in range(len(hits)):
+            if spaceship.shield:
+                spaceship.break_shield()
+            else:
+                self.events.append("clash")
+                spaceship.lives -= 1
+                if spaceship.lives == 0:
+                    return False
+
+        for pickup in self.pickup_hash.query(spaceship.rect):
+            if not pickup.rect.colliderect(spaceship.rect):
+                continue
+            if isinstance(pickup, Crystal):
+                self.score += 1
+                self.remove_pickup(self.crystals, pickup)
+                self.add_pickup(self.crystals, Crystal(rng))
+            else:
+                if pickup.type == "speed":
+                    spaceship.speed = BOOSTED_SPEED
+                    spaceship.speed_timer = self.now + POWER_UP_DURATION
+                elif pickup.type == "shield":
+                    spaceship.shield = True
+                    spaceship.shield_timer = self.now + POWER_UP_DURATION
+                self.remove_pickup(self.power_ups, pickup)
+
+        spaceship.update_timers(self.now)
+
+        if self.score > self.level * 10:
+            self.level += 1
+            self.asteroid_speed += 0.5
+
+        return True
+
+
+class InputLog:
+    # Everything needed to replay a game exactly: the World's seed and the
+    # controls of every step, stored as runs since keys are held for many
+    # steps. The final score and level are kept so a replay can check that it
+    # reached the same result.
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.runs = []  # [packed controls, number of steps]
+        self.steps = 0
+        self.score = 0
+        self.level = 0
+
+    def record(self, controls):
+        bits = pack_controls(controls)
+        if self.runs and self.runs[-1][0] == bits:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([bits, 1])
+        self.steps += 1
+
+    def finish(self, world):
+        self.score = world.score
+        self.level = world.level
+
+    def __iter__(self):
+        # The controls of every step, in order.
+        for bits, count in self.runs:
+            controls = CONTROL_STATES[bits]
+            for _ in range(count):
+                yield controls
+
+    def save(self, path):
+        data = bytearray(REPLAY_HEADER.pack(
+            REPLAY_MAGIC, REPLAY_VERSION, self.seed, self.steps, self.score, self.level
+        ))
+        for bits, count in self.runs:
+            data.append(bits)
+            while count >= 0x80:  # LEB128 varint
+                data.append(count & 0x7F | 0x80)
+                count >>= 7
+            data.append(count)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < REPLAY_HEADER.size:
+            raise ValueError(f"{path}: not a Space Scavenger replay")
+        magic, version, seed, steps, score, level = REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC:
+            raise ValueError(f"{path}: not a Space Scavenger replay")
+        if version != REPLAY_VERSION:
+            raise ValueError(f"{path}: unsupported replay version {version}")
+        log = cls(seed)
+        pos = REPLAY_HEADER.size
+        while pos < len(data):
+            bits = data[pos]
+            if bits >= len(CONTROL_STATES):
+                raise ValueError(f"{path}: bad controls {bits} at byte {pos}")
+            count = shift = 0
+            while True:
+                pos += 1
+                if pos >= len(data):
+                    raise ValueError(f"{path}: replay is truncated")
+                byte = data[pos]
+                count |= (byte & 0x7F) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            pos += 1
+            log.runs.append([bits, count])
+            log.steps += count
+        if log.steps != steps:
+            raise ValueError(f"{path}: expected {steps} steps, found {log.steps}")
+        log.score, log.level = score, level
+        return log
+
+
+def draw_frame(screen, world, alpha=1.0):
+    screen.fill(SPACE_BLUE)
+    draw_starfield(screen, world.stars, alpha)
+    world.spaceship.draw(screen, alpha)
+    draw_game_elements(screen, world, alpha)
+    draw_game_info(screen, world)
 
 
-def draw_game_elements(screen, asteroids, crystals, power_ups):
-    for asteroid in asteroids:
-        asteroid.draw(screen)
-    for power_up in power_ups:
+def draw_game_elements(screen, world, alpha=1.0):
+    world.asteroids.draw(screen, alpha)
+    for power_up in world.power_ups:
         power_up.draw(screen)
-    for crystal in crystals:
+    for crystal in world.crystals:
         crystal.draw(screen)
 
 
-def draw_game_info(screen, spaceship, score, level):
-    font = pygame.font.Font(None, 36)
-    score_text = font.render(f"Score: {score}", True, WHITE)
-    lives_text = font.render(f"Lives: {spaceship.lives}", True, WHITE)
-    level_text = font.render(f"Level: {level}", True, WHITE)
-    screen.blit(score_text, (10, 10))
-    screen.blit(lives_text, (10, 50))
-    screen.blit(level_text, (10, 90))
+def draw_game_info(screen, world):
+    spaceship = world.spaceship
+    score_label, lives_label, level_label = hud_labels
+    score_label.draw(screen, world.score, topleft=(10, 10))
+    lives_label.draw(screen, spaceship.lives, topleft=(10, 50))
+    level_label.draw(screen, world.level, topleft=(10, 90))
 
     pygame.draw.rect(screen, RED, (10, 120, 100, 10))
     pygame.draw.rect(screen, GREEN, (10, 120, 100 * (spaceship.lives / 3), 10))
 
 
-def draw_starfield(screen, stars):
-    for i in range(len(stars)):
-        stars[i] = (stars[i][0], stars[i][1] + 1)
-        if stars[i][1] > HEIGHT:
-            stars[i] = (random.randint(0, WIDTH), 0)
-        pygame.draw.circle(screen, WHITE, stars[i], 1)
+def draw_starfield(screen, stars, alpha=1.0):
+    stars.draw(screen, alpha)
 
 
-def handle_events(spaceship):
+class LoopStats:
+    # Timing of the fixed-timestep loop: simulation steps and rendered frames
+    # per second, and the average cost of each, over the last second.
+
+    def __init__(self):
+        self.visible = False
+        self.total_steps = 0
+        self.total_frames = 0
+        self.dropped_steps = 0  # steps skipped because the game fell too far behind
+        self.step_rate = self.frame_rate = 0.0
+        self.step_ms = self.frame_ms = 0.0
+        self._reset(time.perf_counter())
+
+    def _reset(self, now):
+        self.window_start = now
+        self.steps = self.frames = 0
+        self.step_time = self.frame_time = 0.0
+
+    def add_step(self, seconds):
+        self.steps += 1
+        self.total_steps += 1
+        self.step_time += seconds
+
+    def add_frame(self, seconds):
+        self.frames += 1
+        self.total_frames += 1
+        self.frame_time += seconds
+
+    def update(self, now):
+        elapsed = now - self.window_start
+        if elapsed < 1.0:
+            return
+        self.step_rate = self.steps / elapsed
+        self.frame_rate = self.frames / elapsed
+        self.step_ms = self.step_time / max(self.steps, 1) * 1000
+        self.frame_ms = self.frame_time / max(self.frames, 1) * 1000
+        self._reset(now)
+
+    def __str__(self):
+        return (
+            f"sim {self.step_rate:.0f} Hz ({self.step_ms:.2f} ms/step)  "
+            f"render {self.frame_rate:.0f} fps ({self.frame_ms:.2f} ms/frame)"
+        )
+
+
+def draw_loop_stats(screen, stats):
+    stats_label.draw(screen, str(stats), bottomleft=(10, HEIGHT - 10))
+
+
+def handle_events(stats=None):
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             return False
-        elif event.type == pygame.USEREVENT + 1:
-            spaceship.speed = SPACESHIP_SPEED
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3 and stats:
+            stats.visible = not stats.visible
     return True
 
 
-def initialize_game():
-    global spaceship, asteroids, crystals, power_ups, score, level, clock, stars
-    spaceship = Spaceship()
-    asteroids = []
-    crystals = [Crystal() for _ in range(5)]
-    power_ups = []
-    score = 0
-    level = 1
-    clock = pygame.time.Clock()
-    stars = [(random.randint(0, WIDTH), random.randint(0, HEIGHT)) for _ in range(100)]
-    background_music.play(loops=-1)
+def parse_seed(text):
+    # Replays store the seed as an unsigned 64-bit number.
+    try:
+        seed = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an integer, got {text!r}")
+    if not 0 <= seed < 2**64:
+        raise argparse.ArgumentTypeError("the seed must be from 0 to 2**64 - 1")
+    return seed
 
 
-def update_game():
-    global level, ASTEROID_SPEED, score
-    keys = pygame.key.get_pressed()
-    spaceship.move(keys)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Space Scavenger")
+    parser.add_argument(
+        "--seed", type=parse_seed, help="seed for the game's random numbers"
+    )
+    parser.add_argument(
+        "--record", metavar="PATH", help="save a replay of the game (see space_replay.py)"
+    )
+    return parser.parse_args()
 
-    if random.randint(1, max(50 - level * 2, 10)) == 1:
-        asteroids.append(Asteroid())
 
-    if random.randint(1, 500) == 1:
-        power_ups.append(PowerUp(random.choice(["speed", "shield"])))
-
-    for asteroid in asteroids[:]:
-        asteroid.update()
-        if asteroid.rect.colliderect(spaceship.rect):
-            if spaceship.shield:
-                asteroids.remove(asteroid)
-                spaceship.break_shield()
-            else:
-                clash_sound.play()
-                asteroids.remove(asteroid)
-                spaceship.lives -= 1
-                if spaceship.lives == 0:
-                    return False
-        elif asteroid.is_off_screen():
-            asteroids.remove(asteroid)
-
-    for power_up in power_ups[:]:
-        if power_up.rect.colliderect(spaceship.rect):
-            if power_up.type == "speed":
-                spaceship.speed = 10
-                pygame.time.set_timer(pygame.USEREVENT + 1, 5000)
-            elif power_up.type == "shield":
-                spaceship.shield = True
-                spaceship.shield_timer = pygame.time.get_ticks() + 5000
-            power_ups.remove(power_up)
-
-    spaceship.update_shield()
-
-    for crystal in crystals[:]:
-        if crystal.rect.colliderect(spaceship.rect):
-            score += 1
-            crystals.remove(crystal)
-            crystals.append(Crystal())
-
-    if score > level * 10:
-        level += 1
-        ASTEROID_SPEED += 0.5
-
-    return True
+def main():
+    args = parse_args()
+    seed = args.seed if args.seed is not None else random.getrandbits(63)
+    log = InputLog(seed) if args.record else None
 
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Space Scavenger")
+    load_assets()
 
-initialize_game()
+    world = World(random.Random(seed))
+    clock = pygame.time.Clock()
+    stats = LoopStats()
+    background_music.play(loops=-1)
 
-running = True
-while running:
-    screen.fill(SPACE_BLUE)
-    draw_starfield(screen, stars)
-    running = handle_events(spaceship)
-    if not running:
-        break
-    running = update_game()
-    if not running:
-        break
-    spaceship.draw(screen)
-    draw_game_elements(screen, asteroids, crystals, power_ups)
-    draw_game_info(screen, spaceship, score, level)
-    pygame.display.flip()
-    clock.tick(FPS)
-
-pygame.quit()
+    # The world is stepped at a fixed FPS whatever the render rate: each frame
+    # adds the real time that passed to the accumulator and runs as many
+    # steps as fit, then draws the world interpolated between the last two
+    # steps by the fraction of a step left over.
+    step_seconds = FRAME_TIME / 1000
+    accumulator = 0.0
+    previous = time.perf_counter()
+    running = True
+    while running:
+        now = time.perf_counter()
+        accumulator += now - previous
+        previous = now
+        running = handle_events(stats)
+        controls = keyboard_controls()
+
+        steps = 0
+        while running and accumulator >= step_seconds:
+            if steps == MAX_STEPS_PER_FRAME:
+                stats.dropped_steps += int(accumulator / step_seconds)
+                accumulator %= step_seconds
+                break
+            start = time.perf_counter()
+            if log is not None:
+                log.record(controls)
+            running = world.step(controls)
+            stats.add_step(time.perf_counter() - start)
+            if "clash" in world.events:
+                clash_sound.play()
+            accumulator -= step_seconds
+            steps += 1
+        if not running:
+            break
+
+        start = time.perf_counter()
+        draw_frame(screen, world, accumulator / step_seconds)
+        if stats.visible:
+            draw_loop_stats(screen, stats)
+        pygame.display.flip()
+        stats.add_frame(time.perf_counter() - start)
+        stats.update(time.perf_counter())
+        clock.tick(MAX_RENDER_FPS)
+
+    pygame.quit()
+    if log is not None:
+        log.finish(world)
+        log.save(args.record)
+        print(f"Saved replay of {log.steps} steps (seed {seed}) to {args.record}")
+    print(f"Simulation steps: {stats.total_steps} ({stats.dropped_steps} dropped), "
+          f"frames rendered: {stats.total_frames}")
+    print(f"Asteroid sprite cache: {asteroid_sprites}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Headless batch simulator for Space Scavenger.
+#
+# Runs many games of space_scavenger.World without a window or audio device,
+# driven by a simple scripted pilot, and reports score/level statistics and
+# simulation throughput. Useful for balancing the spawn rates and speeds.
+#
+# Usage: python -m Labs.space_sim --games 2000 --processes 4 --seed 1
+#        python -m Labs.space_sim --stress 10000
+
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import random
+import statistics
+import time
+from multiprocessing import Pool
+
+from Labs.space_scavenger import Controls, World
+
+MAX_STEPS = 60 * 60 * 10  # ten minutes of game time
+
+
+class RandomPilot:
+    # Holds a random direction for a random number of frames, like a
+    # (not very good) human player.
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.controls = Controls(False, False, False, False)
+        self.frames_left = 0
+
+    def __call__(self, world):
+        if self.frames_left <= 0:
+            rng = self.rng
+            self.controls = Controls(*(rng.random() < 0.3 for _ in range(4)))
+            self.frames_left = rng.randint(5, 60)
+        self.frames_left -= 1
+        return self.controls
+
+
+def run_game(seed, max_steps=MAX_STEPS):
+    world = World(random.Random(seed))
+    pilot = RandomPilot(random.Random(seed + 1))
+    while world.steps < max_steps and world.step(pilot(world)):
+        pass
+    return world.score, world.level, world.steps
+
+
+def run_stress(asteroid_count, star_count, steps, seed):
+    # Keep asteroid_count asteroids on screen and time the world update.
+    world = World(random.Random(seed), star_count)
+    world.spaceship.lives = steps + 1  # survive every hit
+    pilot = RandomPilot(random.Random(seed + 1))
+    world.spawn_asteroids(asteroid_count)
+    start = time.perf_counter()
+    for _ in range(steps):
+        world.spawn_asteroids(asteroid_count - len(world.asteroids))
+        world.step(pilot(world))
+    elapsed = time.perf_counter() - start
+    print(f"asteroids:    {len(world.asteroids)}, stars: {len(world.stars)}")
+    print(f"step time:    {elapsed / steps * 1000:.2f} ms ({steps / elapsed:.0f} steps/s)")
+    print(f"hits taken:   {steps + 1 - world.spaceship.lives}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless batch simulator for Space Scavenger.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--stress", type=int, metavar="N", help="time one world with N asteroids instead"
+    )
+    parser.add_argument("--stars", type=int, default=100_000, help="stars for --stress")
+    parser.add_argument("--steps", type=int, default=600, help="steps for --stress")
+    args = parser.parse_args()
+
+    if args.stress:
+        run_stress(args.stress, args.stars, args.steps, args.seed)
+        return
+
+    seeds = [args.seed + 2 * i for i in range(args.games)]
+    start = time.perf_counter()
+    with Pool(args.processes) as pool:
+        results = pool.starmap(run_game, [(seed, args.max_steps) for seed in seeds])
+    elapsed = time.perf_counter() - start
+
+    scores = [score for score, _, _ in results]
+    levels = [level for _, level, _ in results]
+    steps = sum(step for _, _, step in results)
+    print(f"games:        {len(results)} in {elapsed:.2f}s "
+          f"({len(results) / elapsed * 60:.0f} games/min)")
+    print(f"steps:        {steps} ({steps / elapsed:.0f} steps/s)")
+    print(f"score:        mean {statistics.mean(scores):.2f}, max {max(scores)}")
+    print(f"level:        mean {statistics.mean(levels):.2f}, max {max(levels)}")
+    print(f"game length:  mean {steps / len(results) / 60:.1f}s of game time")
+
+
+if __name__ == "__main__":
+    main()
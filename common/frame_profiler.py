@@ -0,0 +1,143 @@
+import csv
+import json
+import math
+import time
+from collections import deque
+
+import pygame
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of values (fraction 0.5 for the median)."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class FrameProfiler:
+    """Splits every frame of a game loop into named phases and times them.
+
+    The loop calls mark(phase) at the end of each phase and end_frame() once
+    the frame is over. A phase lasts from the previous mark (or the end of
+    the previous frame) to its own mark, so the phases add up to the whole
+    frame; marking the same phase twice in a frame adds the two together.
+    Times are perf_counter_ns() nanoseconds.
+
+    The last window frames are kept for the p50/p99 overlay. If trace is a
+    path, every frame is also written there as a row of nanoseconds per
+    phase plus the total: CSV, or one JSON object per line if the path ends
+    in .jsonl.
+    """
+
+    def __init__(self, phases, window=120, trace=None, refresh=15):
+        self.phases = tuple(phases)
+        self.window = window
+        self.refresh = refresh  # frames between redraws of the overlay
+        self.frames = 0
+        self._index = {phase: i for i, phase in enumerate(self.phases)}
+        self._current = [0] * len(self.phases)
+        self._history = [deque(maxlen=window) for _ in self.phases]
+        self._totals = deque(maxlen=window)
+        self._overlay = None
+        self._file = None
+        self._writer = None
+        if trace is not None:
+            self._file = open(trace, "w", newline="")
+            if not str(trace).endswith(".jsonl"):
+                self._writer = csv.writer(self._file)
+                self._writer.writerow(("frame",) + self.phases + ("total",))
+        self._last = time.perf_counter_ns()
+
+    def mark(self, phase):
+        """End phase, which started at the previous mark."""
+        now = time.perf_counter_ns()
+        self._current[self._index[phase]] += now - self._last
+        self._last = now
+
+    def discard(self):
+        """Drop the time since the last end_frame(), e.g. spent setting up a level."""
+        self._current = [0] * len(self.phases)
+        self._last = time.perf_counter_ns()
+
+    def end_frame(self):
+        """Record the frame marked so far and start the next one."""
+        current = self._current
+        total = sum(current)
+        for history, elapsed in zip(self._history, current):
+            history.append(elapsed)
+        self._totals.append(total)
+        if self._file is not None:
+            if self._writer is not None:
+                self._writer.writerow([self.frames] + current + [total])
+            else:
+                row = {"frame": self.frames, **dict(zip(self.phases, current)), "total": total}
+                self._file.write(json.dumps(row) + "\n")
+        self.frames += 1
+        self._current = [0] * len(self.phases)
+        # the bookkeeping above is not part of any frame
+        self._last = time.perf_counter_ns()
+
+    def stats(self):
+        """Return {phase: (p50, p99)} in milliseconds over the window, with "total"."""
+        stats = {}
+        for phase, history in zip(self.phases + ("total",), self._history + [self._totals]):
+            stats[phase] = (percentile(history, 0.5) / 1e6, percentile(history, 0.99) / 1e6)
+        return stats
+
+    def draw(self, target, font, position=(0, 0), color=(255, 255, 255)):
+        """Draw the p50/p99 table on target, re-rendering it every refresh frames."""
+        if self._overlay is None or self.frames % self.refresh == 0:
+            self._overlay = self._render(font, color)
+        target.blit(self._overlay, position)
+
+    def _render(self, font, color):
+        rows = [("phase", "p50 ms", "p99 ms")]
+        for phase, (p50, p99) in self.stats().items():
+            rows.append((phase, f"{p50:.2f}", f"{p99:.2f}"))
+        cells = [[font.render(text, True, color) for text in row] for row in rows]
+        # the phase column is left aligned and the numbers right aligned
+        widths = [max(row[i].get_width() for row in cells) + 8 for i in range(3)]
+        height = font.get_linesize()
+        overlay = pygame.Surface((sum(widths) + 8, height * len(rows) + 8), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 160))
+        for i, (phase, p50, p99) in enumerate(cells):
+            y = 4 + i * height
+            overlay.blit(phase, (4, y))
+            overlay.blit(p50, (4 + widths[0] + widths[1] - p50.get_width(), y))
+            overlay.blit(p99, (4 + sum(widths) - p99.get_width(), y))
+        return overlay
+
+    def close(self):
+        """Finish the trace file, if there is one."""
+        if self._file is not None:
+            self._file.close()
+            self._file = self._writer = None
+
+    def __repr__(self):
+        p50, p99 = self.stats()["total"]
+        return f"<FrameProfiler {self.frames} frames, p50 {p50:.2f} ms, p99 {p99:.2f} ms>"
+
+
+class NullFrameProfiler:
+    """Stands in for a FrameProfiler when profiling is off; does nothing."""
+
+    frames = 0
+
+    def mark(self, phase):
+        pass
+
+    def discard(self):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def draw(self, target, font, position=(0, 0), color=(255, 255, 255)):
+        pass
+
+    def close(self):
+        pass
+
+    def __repr__(self):
+        return "<NullFrameProfiler>"
@@ -0,0 +1,62 @@
+import pygame
+
+from common.sprite_cache import SpriteCache
+
+_fonts = {}
+
+
+def get_font(name=None, size=36):
+    """Return a shared Font, loading each (name, size) pair only once."""
+    font = _fonts.get((name, size))
+    if font is None:
+        font = _fonts[(name, size)] = pygame.font.Font(name, size)
+    return font
+
+
+class Label:
+    """A HUD text element that is only re-rendered when its value changes.
+
+    template is formatted with the value, e.g. Label(font, "Score: {}").
+    """
+
+    def __init__(self, font, template="{}", color=(255, 255, 255), background=None):
+        self.font = font
+        self.template = template
+        self.color = color
+        self.background = background
+        self.renders = 0
+        self._value = None
+        self.surface = None
+
+    def set(self, value):
+        """Update the value, rendering a new surface only if it changed."""
+        if self.surface is None or value != self._value:
+            self._value = value
+            text = self.template.format(value)
+            self.surface = self.font.render(text, True, self.color, self.background)
+            self.renders += 1
+        return self.surface
+
+    def draw(self, target, value, **position):
+        """Draw the label for value, placed like Surface.get_rect(**position)."""
+        surface = self.set(value)
+        rect = surface.get_rect(**position)
+        target.blit(surface, rect)
+        return rect
+
+
+class TextCache(SpriteCache):
+    """LRU cache of rendered text surfaces keyed by (text, color, background)."""
+
+    def __init__(self, font, antialias=True, max_size=256):
+        super().__init__(self._render, max_size)
+        self.font = font
+        self.antialias = antialias
+
+    def _render(self, key):
+        text, color, background = key
+        return self.font.render(text, self.antialias, color, background)
+
+    def render(self, text, color, background=None):
+        """Return the rendered surface, like Font.render but cached."""
+        return self.get((text, color, background))
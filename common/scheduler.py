@@ -0,0 +1,93 @@
+import heapq
+import itertools
+
+
+class Timer:
+    """Handle for a scheduled callback, returned by the Scheduler methods."""
+
+    __slots__ = ("when", "interval", "callback", "args", "cancelled", "sequence")
+
+    def __init__(self, when, interval, callback, args):
+        self.when = when
+        self.interval = interval  # None for a one-shot timer
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+        self.sequence = None  # of the queue entry that is still current
+
+    def cancel(self):
+        """Stop the timer; it is dropped from the queue when it comes due."""
+        self.cancelled = True
+
+
+class Scheduler:
+    """Heap of timed callbacks driven by an external clock.
+
+    Time only moves when advance() is called, by however much the caller
+    says, so the same scheduler runs off the real frame time in a game loop
+    or off a simulated clock in a headless run. Each advance costs
+    O(log n) per callback that fires, however many timers are waiting.
+    Callbacks due at the same time fire in the order they were scheduled.
+    """
+
+    def __init__(self, now=0):
+        self.now = now
+        self._queue = []  # (when, sequence, timer)
+        self._sequence = itertools.count()
+
+    def call_at(self, when, callback, *args):
+        """Call callback(*args) once when the clock reaches when."""
+        return self._push(Timer(when, None, callback, args))
+
+    def call_later(self, delay, callback, *args):
+        """Call callback(*args) once, delay time units from now."""
+        return self._push(Timer(self.now + delay, None, callback, args))
+
+    def call_every(self, interval, callback, *args):
+        """Call callback(*args) every interval time units, starting one interval from now."""
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        return self._push(Timer(self.now + interval, interval, callback, args))
+
+    def reschedule(self, timer, delay=None):
+        """Restart timer so it next fires delay (by default its interval) from now."""
+        if delay is None:
+            delay = timer.interval
+        timer.cancelled = False
+        timer.when = self.now + delay
+        return self._push(timer)
+
+    def cancel(self, timer):
+        """Stop timer from firing again."""
+        timer.cancel()
+
+    def advance(self, elapsed):
+        """Move the clock forward by elapsed, firing every timer that comes due.
+
+        While a callback runs, now is the time it was due, so timers it
+        schedules are relative to that moment.
+        """
+        end = self.now + elapsed
+        queue = self._queue
+        while queue and queue[0][0] <= end:
+            when, sequence, timer = heapq.heappop(queue)
+            if timer.cancelled or timer.sequence != sequence:
+                continue  # cancelled or rescheduled since this entry was pushed
+            self.now = when
+            if timer.interval is not None:
+                timer.when = when + timer.interval
+                self._push(timer)
+            timer.callback(*timer.args)
+        self.now = end
+
+    def __len__(self):
+        return sum(
+            1
+            for _, sequence, timer in self._queue
+            if not timer.cancelled and timer.sequence == sequence
+        )
+
+    def _push(self, timer):
+        timer.sequence = next(self._sequence)
+        heapq.heappush(self._queue, (timer.when, timer.sequence, timer))
+        return timer
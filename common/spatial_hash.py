@@ -0,0 +1,85 @@
+class SpatialHash:
+    """Uniform-grid broad phase for axis-aligned rects.
+
+    Every object is stored in the buckets of all the grid cells its rect
+    overlaps. Moving an object only touches the buckets when it crosses a
+    cell boundary, and a query only looks at the cells under the query rect,
+    so its cost depends on how crowded that area is rather than on the total
+    number of objects. Buckets keep insertion order, which keeps query
+    results deterministic.
+    """
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self._buckets = {}  # (cell x, cell y) -> {obj: None}
+        self._spans = {}  # obj -> (x0, y0, x1, y1) range of cells it occupies
+
+    def _span(self, rect):
+        size = self.cell_size
+        return (
+            rect.left // size,
+            rect.top // size,
+            (rect.right - 1) // size,
+            (rect.bottom - 1) // size,
+        )
+
+    def _add(self, obj, span):
+        buckets = self._buckets
+        x0, y0, x1, y1 = span
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = buckets.get((cx, cy))
+                if bucket is None:
+                    bucket = buckets[(cx, cy)] = {}
+                bucket[obj] = None
+
+    def _discard(self, obj, span):
+        buckets = self._buckets
+        x0, y0, x1, y1 = span
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = buckets[(cx, cy)]
+                del bucket[obj]
+                if not bucket:
+                    del buckets[(cx, cy)]
+
+    def insert(self, obj, rect):
+        """Add an object covering rect."""
+        span = self._span(rect)
+        self._spans[obj] = span
+        self._add(obj, span)
+
+    def remove(self, obj):
+        """Remove an object."""
+        self._discard(obj, self._spans.pop(obj))
+
+    def update(self, obj, rect):
+        """Record that an object now covers rect."""
+        span = self._span(rect)
+        old_span = self._spans[obj]
+        if span != old_span:
+            self._discard(obj, old_span)
+            self._spans[obj] = span
+            self._add(obj, span)
+
+    def query(self, rect):
+        """Return the objects in the cells under rect (candidates, not exact hits)."""
+        buckets = self._buckets
+        x0, y0, x1, y1 = self._span(rect)
+        found = {}
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = buckets.get((cx, cy))
+                if bucket:
+                    found.update(bucket)
+        return list(found)
+
+    def clear(self):
+        self._buckets.clear()
+        self._spans.clear()
+
+    def __contains__(self, obj):
+        return obj in self._spans
+
+    def __len__(self):
+        return len(self._spans)
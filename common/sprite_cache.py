@@ -0,0 +1,52 @@
+from collections import OrderedDict
+
+
+class SpriteCache:
+    """Bounded LRU cache for generated sprites (scaled, rotated or flipped images).
+
+    factory(key) builds the surface the first time a key is requested; after
+    that the same surface is returned until it is evicted as the least
+    recently used entry once the cache holds more than max_size sprites.
+    """
+
+    def __init__(self, factory, max_size=256):
+        self.factory = factory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._sprites = OrderedDict()
+
+    def get(self, key):
+        """Return the sprite for key, building it on a miss."""
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+        self.misses += 1
+        sprite = self.factory(key)
+        self._sprites[key] = sprite
+        if len(self._sprites) > self.max_size:
+            self._sprites.popitem(last=False)
+        return sprite
+
+    @property
+    def hit_rate(self):
+        """Fraction of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        """Drop all cached sprites and reset the counters."""
+        self._sprites.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._sprites)
+
+    def __repr__(self):
+        return (
+            f"<SpriteCache {len(self)}/{self.max_size} sprites, "
+            f"{self.hits} hits, {self.misses} misses, {self.hit_rate:.1%} hit rate>"
+        )